@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+여주 부동산 실거래가 파이프라인 벤치마크
+- 합성 MOLIT XML(유형별 100 ~ 100,000건)로 단계별 시간/최대 RSS/메모리 할당 측정
+- 단계: fetch(스텁 서버 상대 iter_trades) / parse(메모리의 XML 파싱만, 네트워크 제외) / store(저장소 반영) /
+        aggregate(통계·카드·검색 인덱스) / serialize(HTML·JSON) / thumbnail(섬네일)
+- 최대 RSS는 입력(합성 응답 등)을 만든 뒤 다시 잰 단계 구간의 값 (리눅스 VmHWM, 그 밖에는 프로세스 전체 최대값)
+- 결과는 JSON으로 저장하고, 이전 결과와 비교해서 느려진 단계가 있으면 종료 코드 1
+
+사용 예:
+    python bench_realestate.py --sizes 100,1000,10000 --output bench.json
+    python bench_realestate.py --compare bench.json --threshold 0.2
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from datetime import datetime
+
+import stub_server
+from stub_server import molit_xml, trade_xml
+
+PTYPES = ['apt', 'villa', 'house', 'land']
+STAGES = ['fetch', 'parse', 'store', 'aggregate', 'serialize', 'thumbnail']
+# 건수와 관계없는 단계 (가장 작은 크기에서 한 번만 측정)
+SIZE_INDEPENDENT = {'thumbnail'}
+DEAL_YMD = '202610'
+
+
+def make_fixture(ptype: str, n: int) -> bytes:
+    """유형별 n건짜리 MOLIT 응답 (같은 인자면 항상 같은 내용, 해제 거래 1% 포함)"""
+    items = ''.join(trade_xml(ptype, '41670', DEAL_YMD, i, cancel_rate=0.01) for i in range(n))
+    return molit_xml('000', items, 1, n, n)
+
+
+def _max_rss_kb() -> int:
+    try:
+        import resource
+    except ImportError:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def _proc_status_kb(field: str) -> int:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _reset_peak_rss() -> bool:
+    """최대 RSS(VmHWM)를 지금 RSS로 되돌림 - 입력 준비에 쓴 메모리가 단계 측정에 섞이지 않도록 (리눅스만)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return False
+    return _proc_status_kb('VmHWM') > 0
+
+
+def run_case(stage: str, size: int, repeat: int) -> dict:
+    """새 프로세스에서 한 (단계, 건수) 조합을 측정 - 최대 RSS가 다른 조합의 영향을 받지 않도록"""
+    workdir = tempfile.mkdtemp(prefix='bench-realestate-')
+    os.environ['CACHE_DIR'] = os.path.join(workdir, '.cache')
+    if stage == 'fetch':
+        # 같은 프로세스의 스텁 서버에서 실제 조회 경로(페이지 동시 요청 + 스트리밍 파싱)를 잼. 초당 호출 제한은 끔
+        server = stub_server.start_background(['--port', '0', '--cancel-rate', '0.01',
+                                               '--rows', ','.join(f"{ptype}={size}" for ptype in PTYPES)])
+        os.environ.update(MOLIT_BASE_URL=f"http://127.0.0.1:{server.server_address[1]}", MOLIT_API_KEY='bench',
+                          API_RATE='0', API_DAILY_QUOTA='1000000')
+    import fetch_realestate as fr
+
+    # 측정 대상 단계의 입력을 미리 준비
+    fixtures = {ptype: make_fixture(ptype, size) for ptype in PTYPES} if stage != 'fetch' else {}
+    data = {}
+    if stage not in ('fetch', 'parse'):
+        data = {ptype: list(fr.parse_response(body, ptype)) for ptype, body in fixtures.items()}
+    payload = fr.build_payload(data) if stage == 'serialize' else None
+    # 전체 거래 모드(--full-history)와 같은 최신순 목록 - 청크/검색 인덱스 직렬화가 건수에 비례하도록
+    history = {ptype: sorted(trades, key=lambda t: (t.deal_date.toordinal() if t.deal_date else 0, t.amount),
+                          reverse=True)
+               for ptype, trades in data.items()}
+
+    def fetch():
+        for ptype in PTYPES:
+            list(fr.iter_trades(ptype, DEAL_YMD, '41670'))
+
+    def parse():
+        for ptype, body in fixtures.items():
+            list(fr.parse_response(body, ptype))
+
+    def store():
+        conn = fr.open_store(os.path.join(workdir, f"bench-{time.perf_counter_ns()}.db"))
+        for ptype, trades in data.items():
+            fr.store_month(conn, ptype, DEAL_YMD, trades)
+        conn.close()
+
+    def aggregate():
+        fr.build_payload(data)
+
+    def serialize():
+        fr.render_page(payload)
+        fr._json_bytes(payload)
+        fr.write_site(data, out_dir=os.path.join(workdir, 'site'), history=history)
+
+    def thumbnail():
+        path = fr.create_thumbnail(*(len(data[ptype]) for ptype in PTYPES),
+                                   output_path=os.path.join(workdir, 'thumbnail.png'))
+        if path is None:
+            raise RuntimeError('Pillow 또는 폰트 없음')
+
+    run = {'fetch': fetch, 'parse': parse, 'store': store, 'aggregate': aggregate, 'serialize': serialize,
+           'thumbnail': thumbnail}[stage]
+    stage_scoped = _reset_peak_rss()
+    rss_before = _proc_status_kb('VmRSS') if stage_scoped else _max_rss_kb()
+    times = []
+    # 단계가 찍는 진행 메시지는 결과 표를 가리지 않도록 버림
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            times.append((time.perf_counter() - started) * 1000)
+        rss_after = _proc_status_kb('VmHWM') if stage_scoped else _max_rss_kb()
+
+        # 할당 측정은 추적 비용 때문에 시간 측정과 따로 한 번 더 실행
+        tracemalloc.start()
+        run()
+        current, peak = tracemalloc.get_traced_memory()
+        blocks = len(tracemalloc.take_snapshot().traces)
+        tracemalloc.stop()
+
+    return {
+        'stage': stage,
+        'items': size * len(PTYPES),
+        'repeat': repeat,
+        'first_ms': round(times[0], 3),
+        'median_ms': round(statistics.median(times), 3),
+        'min_ms': round(min(times), 3),
+        'peak_rss_mb': round(rss_after / 1024, 1),
+        'rss_growth_mb': round((rss_after - rss_before) / 1024, 1),
+        'rss_scope': 'stage' if stage_scoped else 'process',
+        'alloc_peak_kb': round(peak / 1024, 1),
+        'alloc_retained_kb': round(current / 1024, 1),
+        'alloc_blocks': blocks,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def compare(results: list, baseline_path: str, threshold: float) -> list:
+    """이전 결과 대비 median_ms가 threshold(비율) 넘게 늘어난 조합 목록"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['stage'], r['items']): r for r in json.load(f)['results']}
+    regressions = []
+    print(f"\n📊 비교: {baseline_path}")
+    for r in results:
+        base = baseline.get((r['stage'], r['items']))
+        if not base or not base['median_ms']:
+            continue
+        change = r['median_ms'] / base['median_ms'] - 1
+        mark = '🔺' if change > threshold else '  '
+        print(f"  {mark} {r['stage']:<10} {r['items']:>8}건  {base['median_ms']:>10.1f} -> {r['median_ms']:>10.1f} ms"
+              f" ({change:+.0%})")
+        if change > threshold:
+            regressions.append(r)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='부동산 실거래가 파이프라인 벤치마크')
+    parser.add_argument('--sizes', default='100,1000,10000,100000', help='유형별 건수 목록 (쉼표 구분)')
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"측정할 단계 ({','.join(STAGES)})")
+    parser.add_argument('--repeat', type=int, default=3, help='조합별 반복 횟수 (중앙값 보고)')
+    parser.add_argument('--output', default='bench.json', help='결과 JSON 경로')
+    parser.add_argument('--compare', help='비교할 이전 결과 JSON')
+    parser.add_argument('--threshold', type=float, default=0.2, help='느려짐 허용 비율 (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    sizes = sorted(int(s) for s in args.sizes.split(','))
+    stages = [s for s in args.stages.split(',') if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"알 수 없는 단계: {', '.join(sorted(unknown))}")
+
+    cases = [(stage, size) for stage in stages for size in (sizes[:1] if stage in SIZE_INDEPENDENT else sizes)]
+    results = []
+    context = multiprocessing.get_context('spawn')
+    print(f"⏱️ 벤치마크 {len(cases)}개 조합 (반복 {args.repeat}회)")
+    for stage, size in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            try:
+                result = executor.submit(run_case, stage, size, args.repeat).result()
+            except Exception as e:
+                print(f"  {stage:<10} {size * len(PTYPES):>8}건  건너뜀 ({e})")
+                continue
+        results.append(result)
+        print(f"  {stage:<10} {result['items']:>8}건  {result['median_ms']:>10.1f} ms"
+              f"  RSS {result['peak_rss_mb']:>7.1f} MB  할당 최대 {result['alloc_peak_kb']:>10.1f} KB")
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ 결과 저장: {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)}개 조합이 {args.threshold:.0%} 넘게 느려짐")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
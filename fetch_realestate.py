@@ -7,15 +7,35 @@
 - 워드프레스 발행
 """
 
+from __future__ import annotations
+
+import argparse
+import contextlib
+import functools
+import gzip
+import hashlib
+import heapq
+import io
+import mimetypes
 import os
-import requests
-import xml.etree.ElementTree as ET
-from datetime import datetime, timedelta
-from typing import List, Dict
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import TYPE_CHECKING, List, Dict, Callable, Iterable, Iterator, Optional, Tuple
+from array import array
 from collections import defaultdict
+from urllib.parse import urlparse
 import json
 import base64
 
+# requests(네트워크), xml.etree(응답 파싱), numpy(통계), Pillow(섬네일), pyarrow(내보내기)는 쓰는 함수 안에서 불러옴 -
+# 저장소만 읽는 명령(render/stats 등)은 시작이 빠르고 네트워크 모듈을 아예 불러오지 않는다
+if TYPE_CHECKING:
+    import requests
+
 # ============ 설정 ============
 MOLIT_API_KEY = os.environ.get('MOLIT_API_KEY', '')
 WP_URL = os.environ.get('WP_URL', 'https://yeojugoodnews.com')
@@ -24,103 +44,1506 @@ WP_APP_PASSWORD = os.environ.get('WP_APP_PASSWORD', '')
 
 YEOJU_CODE = '41670'
 
-API_URLS = {
-    'apt': 'https://apis.data.go.kr/1613000/RTMSDataSvcAptTrade/getRTMSDataSvcAptTrade',
-    'villa': 'https://apis.data.go.kr/1613000/RTMSDataSvcRHTrade/getRTMSDataSvcRHTrade',
-    'house': 'https://apis.data.go.kr/1613000/RTMSDataSvcSHTrade/getRTMSDataSvcSHTrade',
-    'land': 'https://apis.data.go.kr/1613000/RTMSDataSvcLandTrade/getRTMSDataSvcLandTrade',
+# 경기도 시군구 법정동 코드 (LAWD_CD)
+GYEONGGI_REGIONS = {
+    '41111': '수원시 장안구', '41113': '수원시 권선구', '41115': '수원시 팔달구', '41117': '수원시 영통구',
+    '41131': '성남시 수정구', '41133': '성남시 중원구', '41135': '성남시 분당구',
+    '41150': '의정부시',
+    '41171': '안양시 만안구', '41173': '안양시 동안구',
+    '41192': '부천시 원미구', '41194': '부천시 소사구', '41196': '부천시 오정구',
+    '41210': '광명시', '41220': '평택시', '41250': '동두천시',
+    '41271': '안산시 상록구', '41273': '안산시 단원구',
+    '41281': '고양시 덕양구', '41285': '고양시 일산동구', '41287': '고양시 일산서구',
+    '41290': '과천시', '41310': '구리시', '41360': '남양주시', '41370': '오산시', '41390': '시흥시',
+    '41410': '군포시', '41430': '의왕시', '41450': '하남시',
+    '41461': '용인시 처인구', '41463': '용인시 기흥구', '41465': '용인시 수지구',
+    '41480': '파주시', '41500': '이천시', '41550': '안성시', '41570': '김포시', '41590': '화성시',
+    '41610': '광주시', '41630': '양주시', '41650': '포천시', '41670': '여주시',
+    '41800': '연천군', '41820': '가평군', '41830': '양평군',
+}
+
+# 조회 지역 (쉼표 구분 코드 목록, 'gyeonggi'는 경기도 전체). 첫 번째 지역으로 페이지를 생성
+_region_env = os.environ.get('REGION_CODES', YEOJU_CODE).strip()
+REGION_CODES = list(GYEONGGI_REGIONS) if _region_env == 'gyeonggi' else [c.strip() for c in _region_env.split(',') if c.strip()]
+
+
+def region_name(lawd_cd: str = None) -> str:
+    """지역 코드 -> 이름 (기본은 페이지를 만드는 첫 조회 지역, 모르는 코드는 코드 그대로)"""
+    lawd_cd = lawd_cd or (REGION_CODES[0] if REGION_CODES else YEOJU_CODE)
+    return GYEONGGI_REGIONS.get(lawd_cd, lawd_cd)
+
+# data.go.kr 호출 제한: 초당 호출 수(토큰 버킷)와 일일 호출 한도(실행 간 누적)
+API_RATE = float(os.environ.get('API_RATE', '10'))
+API_DAILY_QUOTA = int(os.environ.get('API_DAILY_QUOTA', '10000'))
+
+# data.go.kr 장애 대응: 일시 오류 재시도 횟수/백오프 기준(초), 요청 제한 시간(초).
+# 엔드포인트별 연속 실패가 BREAKER_THRESHOLD번이면 BREAKER_COOLDOWN초 동안 호출 없이 바로 실패 처리(저장소의 지난 자료 사용)
+API_RETRIES = int(os.environ.get('API_RETRIES', '3'))
+API_BACKOFF = float(os.environ.get('API_BACKOFF', '1.0'))
+API_TIMEOUT = float(os.environ.get('API_TIMEOUT', '30'))
+BREAKER_THRESHOLD = int(os.environ.get('BREAKER_THRESHOLD', '5'))
+BREAKER_COOLDOWN = float(os.environ.get('BREAKER_COOLDOWN', '60'))
+
+# 로컬 캐시 디렉터리 (GitHub Actions에서는 actions/cache로 실행 간 유지)
+CACHE_DIR = os.environ.get('CACHE_DIR', '.cache')
+STORE_PATH = os.environ.get('STORE_PATH', os.path.join(CACHE_DIR, 'trades.db'))
+
+# HTTP 기록/재생: HTTP_MODE=record면 실제 응답을 HTTP_CASSETTE에 기록, replay면 네트워크 없이 기록된 응답으로 실행
+HTTP_MODE = os.environ.get('HTTP_MODE', '')
+HTTP_CASSETTE = os.environ.get('HTTP_CASSETTE', os.path.join(CACHE_DIR, 'cassette.json'))
+
+# 실행 계측: 요청별 지연/크기/resultCode, 단계별 소요 시간, 유형·월별 건수를 METRICS_PATH(JSON)와
+# GitHub Actions 작업 요약(GITHUB_STEP_SUMMARY)에 남김. PROFILE_PATH를 주면 cProfile 결과도 저장
+METRICS_PATH = os.environ.get('METRICS_PATH', os.path.join(CACHE_DIR, 'metrics.json'))
+PROFILE_PATH = os.environ.get('PROFILE_PATH', '')
+
+# 계약일로부터 신고 기한(30일) + 반영 시차가 지난 달은 마감 처리하고 다시 조회하지 않음
+REPORT_WINDOW_DAYS = int(os.environ.get('REPORT_WINDOW_DAYS', '45'))
+
+QUOTA_PATH = os.path.join(CACHE_DIR, 'quota.json')
+PUBLISH_STATE_PATH = os.path.join(CACHE_DIR, 'publish_state.json')
+
+# 워드프레스 요청 재시도 횟수/백오프 기준(초), 동시 업로드/발행 수
+WP_RETRIES = int(os.environ.get('WP_RETRIES', '4'))
+WP_BACKOFF = float(os.environ.get('WP_BACKOFF', '1.0'))
+WP_CONCURRENCY = int(os.environ.get('WP_CONCURRENCY', '4'))
+PENDING_PATH = os.path.join(CACHE_DIR, 'pending_jobs.json')
+
+# 섬네일 폰트
+FONT_BOLD = os.environ.get('FONT_BOLD', '/usr/share/fonts/truetype/nanum/NanumSquareRoundB.ttf')
+FONT_REGULAR = os.environ.get('FONT_REGULAR', '/usr/share/fonts/truetype/nanum/NanumSquareRoundR.ttf')
+
+# 동시 API 요청 수 (유형 × 월 조합을 한 번에 조회)
+FETCH_CONCURRENCY = int(os.environ.get('FETCH_CONCURRENCY', '8'))
+
+# 페이지당 요청 행 수 (totalCount 기준으로 나머지 페이지를 이어서 조회)
+PAGE_SIZE = int(os.environ.get('PAGE_SIZE', '1000'))
+
+# 전체 거래 보기: 저장소의 모든 거래를 최신순으로 고정 크기 청크(JSON)로 나눠 페이지에서 무한 스크롤
+FULL_HISTORY = os.environ.get('FULL_HISTORY', '') == '1'
+HISTORY_CHUNK_SIZE = int(os.environ.get('HISTORY_CHUNK_SIZE', '500'))
+
+# 지난 실행 이후 신규 거래만 담은 data/delta.json 생성 여부
+DELTA_FEED = os.environ.get('DELTA_FEED', '') == '1'
+
+# 분석용 내보내기: 저장소의 거래를 지역/유형/계약년월 파티션별 Parquet(또는 Arrow IPC) 파일로 (비어 있으면 안 함)
+EXPORT_DIR = os.environ.get('EXPORT_DIR', '')
+EXPORT_FORMAT = os.environ.get('EXPORT_FORMAT', 'parquet')  # parquet | arrow
+
+# 상주 모드(--watch): 확인 주기(초), 확인 결과가 그대로여도 전체 갱신을 돌리는 최대 간격(초)
+WATCH_INTERVAL = int(os.environ.get('WATCH_INTERVAL', '600'))
+WATCH_REFRESH = int(os.environ.get('WATCH_REFRESH', '21600'))
+
+# 국토교통부 API 주소 (stub_server.py 같은 로컬 서버로 바꿔 끼울 때 사용)
+MOLIT_BASE_URL = os.environ.get('MOLIT_BASE_URL', 'https://apis.data.go.kr/1613000').rstrip('/')
+
+# 유형별 필드 매핑: 결과 필드 -> 응답 태그 (앞에서부터 값이 있는 첫 태그 사용)
+_BUILDING_FIELDS = {
+    'name': ('aptNm', 'houseNm', 'mhouseNm', 'offiNm'),
+    'deal_amount': ('dealAmount',),
+    'build_year': ('buildYear',),
+    'deal_year': ('dealYear',),
+    'deal_month': ('dealMonth',),
+    'deal_day': ('dealDay',),
+    'dong': ('umdNm',),
+    'jibun': ('jibun',),
+    'area': ('excluUseAr', 'totFlrAr'),
+    'floor': ('floor',),
+    'deal_type': ('dealingGbn',),
+}
+
+# 전월세: 금액 자리에 보증금, monthly_rent에 월세(만원, 전세는 0), 거래유형 자리에 계약구분(신규/갱신)
+_RENT_FIELDS = {
+    **_BUILDING_FIELDS,
+    'deal_amount': ('deposit',),
+    'monthly_rent': ('monthlyRent',),
+    'deal_type': ('contractType',),
 }
 
-TYPE_LABELS = {
-    'apt': '아파트',
-    'villa': '연립/다세대', 
-    'house': '단독/다가구',
-    'land': '토지'
+# 토지는 단지명이 없으므로 이름은 '동 지번'으로 채움
+_LAND_FIELDS = {
+    'name': (),
+    'deal_amount': ('dealAmount',),
+    'build_year': (),
+    'deal_year': ('dealYear',),
+    'deal_month': ('dealMonth',),
+    'deal_day': ('dealDay',),
+    'dong': ('umdNm',),
+    'jibun': ('jibun',),
+    'area': ('dealArea',),
+    'floor': (),
+    'deal_type': ('dealingGbn',),
 }
 
-TYPE_COLORS = {
-    'apt': '#c084fc',
-    'villa': '#60a5fa',
-    'house': '#4ade80',
-    'land': '#fbbf24'
+# 데이터셋 등록부 - service: 국토교통부 서비스 이름, fields: 필드 매핑, price: 금액 의미(sale 거래금액 / rent 보증금+월세),
+# icon/color/header(그라데이션 두 색, 테두리): 페이지 표시, thumb: 섬네일 박스 배경 (있는 유형만 섬네일에 나옴, 최대 4개).
+# 여기에 추가하고 DATASETS 환경변수에 키를 넣으면 수집/저장/페이지/발행에 모두 반영된다
+DATASETS = {
+    'apt': {'label': '아파트', 'service': 'RTMSDataSvcAptTrade', 'fields': _BUILDING_FIELDS, 'price': 'sale',
+            'icon': '🏢', 'color': '#c084fc', 'header': ('#4a1d6a', '#1a0a2e', '#6b3d99'), 'thumb': '#3d2066'},
+    'villa': {'label': '연립/다세대', 'service': 'RTMSDataSvcRHTrade', 'fields': _BUILDING_FIELDS, 'price': 'sale',
+              'icon': '🏘️', 'color': '#60a5fa', 'header': ('#1e3a5f', '#0f1f33', '#3b82f6'), 'thumb': '#1e3a5f'},
+    'house': {'label': '단독/다가구', 'service': 'RTMSDataSvcSHTrade', 'fields': _BUILDING_FIELDS, 'price': 'sale',
+              'icon': '🏠', 'color': '#4ade80', 'header': ('#14532d', '#0a2615', '#22c55e'), 'thumb': '#14532d'},
+    'land': {'label': '토지', 'service': 'RTMSDataSvcLandTrade', 'fields': _LAND_FIELDS, 'price': 'sale',
+             'icon': '🌳', 'color': '#fbbf24', 'header': ('#713f12', '#3d2106', '#f59e0b'), 'thumb': '#713f12'},
+    'offi': {'label': '오피스텔', 'service': 'RTMSDataSvcOffiTrade', 'fields': _BUILDING_FIELDS, 'price': 'sale',
+             'icon': '🏬', 'color': '#fb923c', 'header': ('#7c2d12', '#3b1507', '#f97316')},
+    'presale': {'label': '분양권', 'service': 'RTMSDataSvcSilvTrade', 'fields': _BUILDING_FIELDS, 'price': 'sale',
+                'icon': '📝', 'color': '#818cf8', 'header': ('#312e81', '#17153d', '#6366f1')},
+    'apt_rent': {'label': '아파트 전월세', 'service': 'RTMSDataSvcAptRent', 'fields': _RENT_FIELDS, 'price': 'rent',
+                 'icon': '🔑', 'color': '#f472b6', 'header': ('#5b1a3f', '#2a0b1d', '#db2777')},
+    'villa_rent': {'label': '연립/다세대 전월세', 'service': 'RTMSDataSvcRHRent', 'fields': _RENT_FIELDS, 'price': 'rent',
+                   'icon': '🔑', 'color': '#22d3ee', 'header': ('#164e63', '#082f3a', '#06b6d4')},
+    'house_rent': {'label': '단독/다가구 전월세', 'service': 'RTMSDataSvcSHRent', 'fields': _RENT_FIELDS, 'price': 'rent',
+                   'icon': '🔑', 'color': '#a3e635', 'header': ('#3f6212', '#1c2d07', '#84cc16')},
+    'offi_rent': {'label': '오피스텔 전월세', 'service': 'RTMSDataSvcOffiRent', 'fields': _RENT_FIELDS, 'price': 'rent',
+                  'icon': '🔑', 'color': '#f87171', 'header': ('#7f1d1d', '#3b0d0d', '#ef4444')},
 }
 
+# 수집/발행할 데이터셋 (쉼표 구분 키 또는 all, 기본은 매매 4종)
+_datasets_env = os.environ.get('DATASETS', 'apt,villa,house,land').strip()
+ENABLED_TYPES = list(DATASETS) if _datasets_env == 'all' else \
+    [key.strip() for key in _datasets_env.split(',') if key.strip() in DATASETS]
+
+API_URLS = {ptype: f"{MOLIT_BASE_URL}/{d['service']}/get{d['service']}" for ptype, d in DATASETS.items()}
+FIELD_MAPS = {ptype: d['fields'] for ptype, d in DATASETS.items()}
+TYPE_LABELS = {ptype: d['label'] for ptype, d in DATASETS.items()}
+TYPE_COLORS = {ptype: d['color'] for ptype, d in DATASETS.items()}
+
+
+def is_rent(property_type: str) -> bool:
+    """전월세 데이터셋 (금액 = 보증금, 시세/신고가 비교 대상 아님)"""
+    return DATASETS.get(property_type, {}).get('price') == 'rent'
+
+
+# ============ 거래 레코드 ============
+class Trade:
+    """거래 1건 - 금액/면적/층/건축년도/계약일은 수집 시점에 한 번만 숫자/날짜로 변환"""
+    __slots__ = ('type', 'name', 'amount', 'build_year', 'deal_date', 'dong', 'jibun', 'area', 'floor', 'deal_type',
+                 'prev_max', 'ref_median', 'monthly_rent')
+
+    def __init__(self, type: str, name: str, amount: int, build_year: int, deal_date: Optional[date],
+                 dong: str, jibun: str, area: float, floor: int, deal_type: str,
+                 prev_max: Optional[int] = None, ref_median: Optional[int] = None, monthly_rent: int = 0):
+        self.type = type
+        self.name = name
+        self.amount = amount
+        self.build_year = build_year
+        self.deal_date = deal_date
+        self.dong = dong
+        self.jibun = jibun
+        self.area = area
+        self.floor = floor
+        self.deal_type = deal_type
+        # 같은 단지·면적의 직전까지 최고가/최근 중위가 (저장소의 시세 인덱스가 채움, 비교 대상이 없으면 None)
+        self.prev_max = prev_max
+        self.ref_median = ref_median
+        # 전월세의 월세(만원) - 매매와 전세는 0, 전월세의 amount는 보증금
+        self.monthly_rent = monthly_rent
+
+    @property
+    def is_record_high(self) -> bool:
+        """신고가 - 같은 단지·면적의 이전 최고가를 넘은 거래"""
+        return self.prev_max is not None and self.amount > self.prev_max
+
+    @classmethod
+    def from_fields(cls, property_type: str, f: Dict[str, str]) -> 'Trade':
+        """FIELD_MAPS로 뽑은 문자열 필드에서 생성"""
+        try:
+            deal_date = date(int(f['deal_year']), int(f['deal_month']), int(f['deal_day']))
+        except (ValueError, KeyError):
+            deal_date = None
+        return cls(
+            type=property_type,
+            name=f['name'] or f"{f['dong']} {f['jibun']}",
+            amount=parse_amount(f['deal_amount']),
+            build_year=_to_int(f['build_year']),
+            deal_date=deal_date,
+            dong=f['dong'],
+            jibun=f['jibun'],
+            area=_to_float(f['area']),
+            floor=_to_int(f['floor']),
+            deal_type=f['deal_type'],
+            monthly_rent=parse_amount(f.get('monthly_rent', '')),
+        )
+
+    @property
+    def sort_key(self) -> date:
+        return self.deal_date or date.min
+
+    def __repr__(self):
+        return f"Trade({self.type} {self.name} {self.amount} {self.deal_date})"
+
+
+def _to_int(s: str) -> int:
+    try:
+        return int(s)
+    except ValueError:
+        return 0
+
+
+def _to_float(s: str) -> float:
+    try:
+        return float(s)
+    except ValueError:
+        return 0.0
+
+
+# ============ 계측 ============
+# 정상 응답은 <resultCode>, 인증키/한도 오류 등 게이트웨이 응답은 <returnReasonCode>에 코드가 옴
+_RESULT_CODE_RE = re.compile(rb'<(?:resultCode|returnReasonCode)>\s*([^<\s]+)\s*</')
+_RESULT_MSG_RE = re.compile(rb'<(?:resultMsg|returnAuthMsg)>\s*([^<]*?)\s*</')
+_SECRET_RE = re.compile(r'(serviceKey=)[^&\s]+')
+
+
+def _redact(text: str) -> str:
+    """오류 메시지에 섞인 인증키 가리기 (requests 오류 메시지에는 요청 URL이 그대로 들어감)"""
+    text = _SECRET_RE.sub(r'\1***', text)
+    return text.replace(MOLIT_API_KEY, '***') if MOLIT_API_KEY else text
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+class Metrics:
+    """실행 한 번의 계측 - 요청별 지연/크기/상태/resultCode, 단계별 소요 시간, 유형·월별 건수, 삼킨 오류
+
+    여러 스레드에서 기록하므로 lock으로 보호한다. 요청 상세는 MAX_REQUESTS건까지만 남기고 엔드포인트별 집계는 전부 반영한다.
+    """
+    MAX_REQUESTS = 2000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = datetime.now()
+        self.requests = []
+        self.endpoints = defaultdict(lambda: {'count': 0, 'errors': 0, 'bytes': 0, 'ms': [], 'codes': defaultdict(int)})
+        self.stages = {}
+        self.rows = {'fetched': {}, 'loaded': {}}
+        self.errors = []
+        self.info = {}
+        self.profile = None
+
+    def record_request(self, entry: Dict):
+        failed = bool(entry.get('error')) or entry.get('status', 0) >= 400 \
+            or entry.get('result_code') not in (None, *API_OK_CODES, *API_NODATA_CODES)
+        with self.lock:
+            if len(self.requests) < self.MAX_REQUESTS:
+                self.requests.append(entry)
+            stats = self.endpoints[entry['endpoint']]
+            stats['count'] += 1
+            stats['errors'] += failed
+            stats['bytes'] += entry.get('bytes', 0)
+            stats['ms'].append(entry['ms'])
+            stats['codes'][str(entry.get('result_code') or entry.get('status') or 'error')] += 1
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """with _metrics.stage('sync'): ... - 같은 이름은 누적"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            with self.lock:
+                self.stages[name] = round(self.stages.get(name, 0) + elapsed, 1)
+
+    def count_rows(self, kind: str, lawd_cd: str, property_type: str, deal_ymd: str, count: int):
+        """kind: fetched(API에서 받아 저장소에 반영한 건수) / loaded(페이지에 실은 건수)"""
+        with self.lock:
+            self.rows[kind].setdefault(lawd_cd, {}).setdefault(property_type, {})[deal_ymd] = count
+
+    def error(self, stage: str, context: str, exc: BaseException):
+        with self.lock:
+            self.errors.append({'stage': stage, 'context': context, 'type': type(exc).__name__,
+                                'message': _redact(str(exc))[:500]})
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            endpoints = {
+                name: {'count': s['count'], 'errors': s['errors'], 'bytes': s['bytes'],
+                       'p50_ms': _percentile(s['ms'], 50), 'p95_ms': _percentile(s['ms'], 95),
+                       'max_ms': max(s['ms']) if s['ms'] else 0.0, 'codes': dict(s['codes'])}
+                for name, s in sorted(self.endpoints.items())
+            }
+            return {
+                'started': self.started.isoformat(timespec='seconds'),
+                'seconds': round((datetime.now() - self.started).total_seconds(), 2),
+                'info': dict(self.info),
+                'stages_ms': dict(self.stages),
+                'rows': json.loads(json.dumps(self.rows)),
+                'endpoints': endpoints,
+                'errors': list(self.errors),
+                'requests': list(self.requests),
+                'profile': self.profile,
+            }
+
+    def write(self, path: str = METRICS_PATH) -> str:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+        return path
+
+    def summary_markdown(self) -> str:
+        """GitHub Actions 작업 요약용 마크다운"""
+        m = self.to_dict()
+        lines = [f"## 🏠 부동산 실거래가 실행 ({m['seconds']:.1f}s)", '']
+        if m['info']:
+            lines += [' · '.join(f"**{key}** {value}" for key, value in m['info'].items()), '']
+        if m['stages_ms']:
+            lines += ['| 단계 | 소요 시간 |', '|---|---:|']
+            lines += [f"| {name} | {ms / 1000:.2f}s |" for name, ms in m['stages_ms'].items()]
+            lines.append('')
+        if m['endpoints']:
+            lines += ['| 요청 | 횟수 | 실패 | p50 | p95 | 받은 양 | 응답 코드 |', '|---|---:|---:|---:|---:|---:|---|']
+            for name, s in m['endpoints'].items():
+                codes = ', '.join(f"{code}×{n}" for code, n in sorted(s['codes'].items()))
+                lines.append(f"| `{name}` | {s['count']} | {s['errors']} | {s['p50_ms']:.0f}ms | {s['p95_ms']:.0f}ms "
+                             f"| {s['bytes'] / 1024:.0f}KB | {codes} |")
+            lines.append('')
+        for kind, label in (('fetched', '수집'), ('loaded', '페이지')):
+            if not m['rows'][kind]:
+                continue
+            lines += [f"| {label} 건수 | 유형 | 월별 |", '|---|---|---|']
+            for lawd_cd, by_type in sorted(m['rows'][kind].items()):
+                for ptype, by_month in sorted(by_type.items()):
+                    months = ', '.join(f"{ym}: {n}" for ym, n in sorted(by_month.items()))
+                    lines.append(f"| {lawd_cd} | {TYPE_LABELS.get(ptype, ptype)} | {months} |")
+            lines.append('')
+        if m['errors']:
+            lines += [f"### ⚠️ 오류 {len(m['errors'])}건", '']
+            lines += [f"- `{e['stage']}` {e['context']}: {e['type']} {e['message']}" for e in m['errors'][:20]]
+            lines.append('')
+        if m['profile']:
+            lines += ['<details><summary>프로파일 (누적 시간 상위)</summary>', '', '| 함수 | 호출 | 누적 |', '|---|---:|---:|']
+            lines += [f"| `{p['function']}` | {p['calls']} | {p['cumtime_ms']:.0f}ms |" for p in m['profile']]
+            lines += ['', '</details>', '']
+        return '\n'.join(lines)
+
+    def write_summary(self, path: str = None) -> Optional[str]:
+        """GITHUB_STEP_SUMMARY가 있으면(= Actions 안) 요약을 덧붙임"""
+        path = path or os.environ.get('GITHUB_STEP_SUMMARY')
+        if not path:
+            return None
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(self.summary_markdown() + '\n')
+        return path
+
+
+_metrics = Metrics()
+
+
+def request_metrics(request: requests.PreparedRequest) -> Dict:
+    """요청 기록의 기본 항목 - 글/미디어 id는 {id}로 묶고, 국토교통부 요청은 지역/계약년월/페이지를 따로 남김"""
+    url = urlparse(request.url)
+    path = re.sub(r'/\d+(?=/|$)', '/{id}', url.path)
+    entry = {'endpoint': f"{request.method} {path}"}
+    query = dict(part.split('=', 1) for part in url.query.split('&') if '=' in part)
+    for param, field in (('LAWD_CD', 'lawd_cd'), ('DEAL_YMD', 'ym'), ('pageNo', 'page')):
+        if param in query:
+            entry[field] = query[param]
+    return entry
+
+
+def start_profiler():
+    """PROFILE_PATH가 있으면 cProfile 시작 (메인 스레드만 잡힘 - 동시 조회/렌더링 작업은 각 단계 시간으로 확인)"""
+    if not PROFILE_PATH:
+        return None
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def stop_profiler(profiler, top: int = 20):
+    """프로파일을 PROFILE_PATH에 저장하고 누적 시간 상위 함수를 계측 결과에 담음 (python -m pstats로 열람)"""
+    import pstats
+    profiler.disable()
+    if os.path.dirname(PROFILE_PATH):
+        os.makedirs(os.path.dirname(PROFILE_PATH), exist_ok=True)
+    profiler.dump_stats(PROFILE_PATH)
+    entries = sorted(pstats.Stats(profiler).stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+    _metrics.profile = [
+        {'function': f"{os.path.basename(filename)}:{line}({name})", 'calls': calls,
+         'tottime_ms': round(tottime * 1000, 1), 'cumtime_ms': round(cumtime * 1000, 1)}
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in entries
+    ]
+    print(f"  🔬 프로파일: {PROFILE_PATH}")
+
+
+# ============ HTTP 계층 ============
+# 국토교통부/워드프레스 요청은 모두 new_session()으로 만든 세션을 거침 - 여기서 기록/재생 어댑터를 끼움
+class Cassette:
+    """요청(메서드 + 인증키를 뺀 URL)별 응답을 순서대로 담는 기록 파일
+
+    같은 요청이 여러 번 오면 기록된 순서대로 돌려주고, 다 쓰면 마지막 응답을 반복한다.
+    요청 본문은 키에 넣지 않아 글 제목의 날짜 등이 바뀌어도 재생된다. 인증 헤더와 serviceKey는 기록하지 않는다.
+    """
+    SECRET_PARAMS = ('serviceKey',)
+
+    def __init__(self, path: str, mode: str):
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.positions = defaultdict(int)
+        self.interactions = defaultdict(list)
+        if mode == 'replay':
+            try:
+                with open(path, encoding='utf-8') as f:
+                    for entry in json.load(f)['interactions']:
+                        self.interactions[entry['key']].append(entry)
+            except (OSError, ValueError, KeyError) as e:
+                raise RuntimeError(f"HTTP 기록 파일을 읽을 수 없음: {path} ({e})")
+
+    def key(self, request: requests.PreparedRequest) -> str:
+        url = urlparse(request.url)
+        query = '&'.join(part for part in sorted(url.query.split('&'))
+                         if part and part.split('=', 1)[0] not in self.SECRET_PARAMS)
+        return f"{request.method} {url.scheme}://{url.netloc}{url.path}" + (f"?{query}" if query else '')
+
+    def record(self, key: str, response: requests.Response):
+        entry = {
+            'key': key,
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': {name: value for name, value in response.headers.items() if name.lower() == 'content-type'},
+            'body': base64.b64encode(response.content).decode('ascii'),
+        }
+        with self.lock:
+            self.interactions[key].append(entry)
+            tmp_path = self.path + '.tmp'
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'interactions': [e for entries in self.interactions.values() for e in entries]}, f,
+                          ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+
+    def play(self, key: str) -> Optional[Dict]:
+        with self.lock:
+            entries = self.interactions.get(key)
+            if not entries:
+                return None
+            position = self.positions[key]
+            self.positions[key] = position + 1
+            return entries[min(position, len(entries) - 1)]
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    global _cassette
+    if HTTP_MODE not in ('record', 'replay'):
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(HTTP_CASSETTE, HTTP_MODE)
+    return _cassette
+
+
+@functools.lru_cache(maxsize=None)
+def _http_types() -> Tuple[type, type]:
+    """(MeteredSession, CassetteAdapter) - requests는 처음 세션을 만들 때 불러옴"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    class MeteredSession(requests.Session):
+        """보낸 요청마다 지연/크기/상태/resultCode를 _metrics에 남기는 세션 (연결 오류도 기록 후 그대로 올림)"""
+
+        def send(self, request, **kwargs):
+            entry = request_metrics(request)
+            started = time.perf_counter()
+            try:
+                response = super().send(request, **kwargs)
+            except requests.RequestException as e:
+                entry.update(ms=round((time.perf_counter() - started) * 1000, 1),
+                             error=_redact(f"{type(e).__name__}: {e}"))
+                _metrics.record_request(entry)
+                raise
+            body = response.content
+            entry.update(ms=round((time.perf_counter() - started) * 1000, 1), status=response.status_code,
+                         bytes=len(body))
+            match = _RESULT_CODE_RE.search(body[:4096])
+            if match:
+                entry['result_code'] = match.group(1).decode('ascii', 'replace')
+            _metrics.record_request(entry)
+            return response
+
+    class CassetteAdapter(HTTPAdapter):
+        """record면 실제로 보내고 응답을 기록, replay면 보내지 않고 기록에서 응답을 만듦 (없으면 ConnectionError)"""
+
+        def __init__(self, cassette: Cassette, **kwargs):
+            super().__init__(**kwargs)
+            self.cassette = cassette
+
+        def send(self, request, **kwargs):
+            key = self.cassette.key(request)
+            if self.cassette.mode != 'replay':
+                response = super().send(request, **kwargs)
+                response.content  # 본문을 읽어 둬야 기록 후에도 호출자가 쓸 수 있음
+                self.cassette.record(key, response)
+                return response
+
+            entry = self.cassette.play(key)
+            if entry is None:
+                raise requests.ConnectionError(f"HTTP 기록에 없는 요청: {key}", request=request)
+            response = requests.Response()
+            response.status_code = entry['status']
+            response.reason = entry.get('reason', '')
+            response.headers = requests.structures.CaseInsensitiveDict(entry['headers'])
+            response._content = base64.b64decode(entry['body'])
+            response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+            response.url = request.url
+            response.request = request
+            return response
+
+    return MeteredSession, CassetteAdapter
+
+
+def new_session(pool_connections: int, pool_maxsize: int) -> requests.Session:
+    """커넥션 풀 세션 (요청마다 계측) - HTTP_MODE가 record/replay면 기록/재생 어댑터를 씀"""
+    from requests.adapters import HTTPAdapter
+    MeteredSession, CassetteAdapter = _http_types()
+    cassette = get_cassette()
+    if cassette:
+        adapter = CassetteAdapter(cassette, pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    else:
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session = MeteredSession()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
 
 # ============ API 호출 ============
-def fetch_trades(property_type: str, deal_ymd: str) -> List[Dict]:
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """keep-alive 커넥션 풀을 공유하는 세션"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = new_session(pool_connections=4, pool_maxsize=max(FETCH_CONCURRENCY, 1))
+    return _session
+
+
+def iter_trades(property_type: str, deal_ymd: str, lawd_cd: str = YEOJU_CODE) -> Iterator[Trade]:
+    """전체 페이지를 순회하며 거래를 도착하는 대로 yield
+
+    첫 페이지의 totalCount로 남은 페이지 수를 계산하고, 나머지 페이지는 동시에 요청한다.
+    네트워크/HTTP/API 오류는 그대로 올려보낸다 (빈 목록과 구분해야 하는 호출자용). 한 페이지라도 실패하면
+    아직 시작하지 않은 페이지 요청은 취소한다.
+    """
     if not MOLIT_API_KEY:
-        return []
+        return
     
     url = API_URLS.get(property_type)
     if not url:
-        return []
+        return
     
+    meta = {}
+    yield from parse_response(_fetch_page(url, deal_ymd, 1, lawd_cd), property_type, meta)
+    if meta.get('resultCode') not in (None, *API_OK_CODES):
+        return
+    
+    total_count = int(meta.get('totalCount') or 0)
+    pages = range(2, -(-total_count // PAGE_SIZE) + 1)
+    if not pages:
+        return
+    
+    workers = max(1, min(FETCH_CONCURRENCY, len(pages)))
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_fetch_page, url, deal_ymd, page, lawd_cd) for page in pages]
+        try:
+            for future in as_completed(futures):
+                yield from parse_response(future.result(), property_type)
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _fetch_page(url: str, deal_ymd: str, page_no: int, lawd_cd: str = YEOJU_CODE, num_rows: int = PAGE_SIZE) -> bytes:
+    """한 페이지 요청 (응답 본문 그대로 반환)
+
+    일시 오류(연결 실패/시간 초과, HTTP 429·5xx, resultCode 01·02·04·05·99)는 지수 백오프 + 지터로
+    API_RETRIES번까지 다시 시도한다. 호출 한도 초과(22)는 QuotaExceeded, 그 밖의 오류는 ApiError로 올린다.
+    엔드포인트가 차단 중이면 호출 없이 바로 CircuitOpen.
+    """
+    import requests
+    breaker = get_breaker(url)
     params = {
         'serviceKey': MOLIT_API_KEY,
-        'LAWD_CD': YEOJU_CODE,
+        'LAWD_CD': lawd_cd,
         'DEAL_YMD': deal_ymd,
-        'pageNo': 1,
-        'numOfRows': 1000
+        'pageNo': page_no,
+        'numOfRows': num_rows
     }
     
-    try:
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        
-        root = ET.fromstring(response.content)
-        
-        result_code = root.find('.//resultCode')
-        if result_code is not None and result_code.text not in ['00', '000']:
-            return []
-        
-        trades = []
-        for item in root.findall('.//item'):
-            if property_type == 'land':
-                trade = {
-                    'type': property_type,
-                    'name': get_text(item, 'umdNm') + ' ' + get_text(item, 'jibun'),
-                    'deal_amount': get_text(item, 'dealAmount'),
-                    'build_year': '',
-                    'deal_year': get_text(item, 'dealYear'),
-                    'deal_month': get_text(item, 'dealMonth'),
-                    'deal_day': get_text(item, 'dealDay'),
-                    'dong': get_text(item, 'umdNm'),
-                    'jibun': get_text(item, 'jibun'),
-                    'area': get_text(item, 'dealArea'),
-                    'floor': '',
-                    'deal_type': get_text(item, 'dealingGbn'),
-                }
-            else:
-                trade = {
-                    'type': property_type,
-                    'name': get_text(item, 'aptNm') or get_text(item, 'houseNm') or get_text(item, 'mhouseNm') or '',
-                    'deal_amount': get_text(item, 'dealAmount'),
-                    'build_year': get_text(item, 'buildYear'),
-                    'deal_year': get_text(item, 'dealYear'),
-                    'deal_month': get_text(item, 'dealMonth'),
-                    'deal_day': get_text(item, 'dealDay'),
-                    'dong': get_text(item, 'umdNm'),
-                    'jibun': get_text(item, 'jibun'),
-                    'area': get_text(item, 'excluUseAr') or get_text(item, 'totFlrAr') or '',
-                    'floor': get_text(item, 'floor'),
-                    'deal_type': get_text(item, 'dealingGbn'),
-                }
-                if not trade['name']:
-                    trade['name'] = f"{trade['dong']} {trade['jibun']}"
-            trades.append(trade)
-        
-        return trades
+    for attempt in range(API_RETRIES + 1):
+        if attempt:
+            time.sleep(API_BACKOFF * 2 ** (attempt - 1) + random.uniform(0, API_BACKOFF))
+        breaker.before_call()
+        # 시험 요청 자리가 남지 않도록 결과와 관계없이 record() - 한도 초과처럼 엔드포인트 탓이 아닌 예외는 None
+        ok = None
+        try:
+            get_quota().consume()
+            _rate_limiter.acquire()
+            response = get_session().get(url, params=params, timeout=API_TIMEOUT)
+            if response.status_code in HTTP_RETRY_STATUS:
+                raise ApiError(f"HTTP {response.status_code}", str(response.status_code), retryable=True)
+            if response.status_code >= 400:
+                raise ApiError(f"HTTP {response.status_code}", str(response.status_code))
+            check_result(response.content)
+            ok = True
+        except (requests.ConnectionError, requests.Timeout, ApiError) as e:
+            ok = False
+            if isinstance(e, ApiError) and not e.retryable or attempt == API_RETRIES:
+                raise
+            continue
+        finally:
+            breaker.record(ok)
+        return response.content
+
+
+def check_result(content: bytes):
+    """응답 헤더의 resultCode 확인 - 정상/데이터 없음이면 그대로, 한도 초과면 QuotaExceeded, 나머지는 ApiError"""
+    match = _RESULT_CODE_RE.search(content[:4096])
+    if not match:
+        raise ApiError("응답에 resultCode 없음", retryable=True)
+    code = match.group(1).decode('ascii', 'replace')
+    if code in API_OK_CODES or code in API_NODATA_CODES:
+        return
+    msg = _RESULT_MSG_RE.search(content[:4096])
+    message = f"resultCode {code}" + (f" ({msg.group(1).decode('utf-8', 'replace')})" if msg else '')
+    if code in API_QUOTA_CODES:
+        raise QuotaExceeded(f"data.go.kr 호출 한도 초과: {message}")
+    raise ApiError(message, code, retryable=code in API_RETRY_CODES)
+
+
+def parse_response(content: bytes, property_type: str, meta: Dict = None) -> Iterator[Trade]:
+    """MOLIT XML 응답을 한 번만 훑으며 거래를 yield
+
+    iterparse로 <item> 하나가 끝날 때마다 자식 태그를 필드 맵으로 옮기고 바로 비워서
+    응답 크기와 관계없이 메모리 사용량이 일정하다. resultCode/totalCount 등 헤더 값은 meta에 담는다.
+    resultCode가 정상이 아니면 거래 없이 종료한다. 해제된 거래는 건너뛰고 meta['cancelled']로 센다.
+    """
+    import xml.etree.ElementTree as ET
+    field_map = FIELD_MAPS[property_type]
+    if meta is None:
+        meta = {}
+    
+    items = None
+    for event, elem in ET.iterparse(io.BytesIO(content), events=('start', 'end')):
+        tag = elem.tag
+        if event == 'start':
+            if tag == 'items':
+                items = elem
+            continue
         
+        if tag == 'item':
+            fields = {child.tag: child.text for child in elem}
+            if items is not None:
+                items.clear()
+            else:
+                elem.clear()
+            # 해제된 거래(cdealType=O)는 빼서, 저장소에서 사라진 거래와 똑같이 처리되게 함
+            if (fields.get('cdealType') or '').strip() == 'O':
+                meta['cancelled'] = meta.get('cancelled', 0) + 1
+                continue
+            yield _map_fields(fields, property_type, field_map)
+        elif tag in ('resultCode', 'resultMsg', 'totalCount'):
+            meta[tag] = (elem.text or '').strip()
+            if tag == 'resultCode' and meta[tag] not in ('00', '000'):
+                return
+
+
+def _map_fields(fields: Dict, property_type: str, field_map: Dict) -> Trade:
+    mapped = {}
+    for key, tags in field_map.items():
+        value = ''
+        for tag in tags:
+            text = fields.get(tag)
+            if text and text.strip():
+                value = text.strip()
+                break
+        mapped[key] = value
+    return Trade.from_fields(property_type, mapped)
+
+
+# ============ 호출 스케줄러 ============
+FetchJob = Tuple[str, str, str]  # (법정동코드, 유형, 계약년월)
+
+
+class QuotaExceeded(Exception):
+    """일일 API 호출 한도 소진"""
+
+
+class ApiError(Exception):
+    """data.go.kr 오류 응답/HTTP 오류 - retryable이면 잠시 뒤 다시 시도할 만한 일시 오류"""
+
+    def __init__(self, message: str, code: str = '', retryable: bool = False):
+        super().__init__(message)
+        self.code = code
+        self.retryable = retryable
+
+
+class CircuitOpen(ApiError):
+    """연속 실패로 차단된 엔드포인트 - 호출하지 않고 바로 실패"""
+
+
+# data.go.kr resultCode: 정상, 데이터 없음, 일시 오류(01 앱 오류, 02 DB 오류, 04 HTTP 오류, 05 서비스 시간 초과, 99 알 수 없음),
+# 호출 한도 초과. 그 밖의 코드(10~12 요청 오류, 20~33 인증키/권한 오류)는 다시 시도해도 같은 결과라 바로 실패
+API_OK_CODES = {'00', '000'}
+API_NODATA_CODES = {'03'}
+API_RETRY_CODES = {'01', '02', '04', '05', '99'}
+API_QUOTA_CODES = {'22'}
+HTTP_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitBreaker:
+    """엔드포인트별 차단기 (스레드 간 공유)
+
+    연속 실패가 threshold번이 되면 cooldown초 동안 열려서 호출 없이 CircuitOpen을 낸다. 시간이 지나면
+    한 요청만 시험으로 보내 성공하면 닫고, 실패하면 다시 cooldown초 동안 연다. 재시도해도 소용없는
+    오류(잘못된 요청 등)도 실패 한 번으로만 센다 - 한 달치 요청 오류로 엔드포인트 전체를 막지 않도록.
+    """
+
+    def __init__(self, name: str, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.name = name
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if self.probing or time.monotonic() - self.opened_at < self.cooldown:
+                raise CircuitOpen(f"{self.name} 차단 중 (연속 실패 {self.failures}회)", retryable=False)
+            self.probing = True
+
+    def record(self, ok: Optional[bool]):
+        """ok=None은 성공도 실패도 아님 (한도 초과 등) - 시험 요청 자리만 비움"""
+        with self.lock:
+            self.probing = False
+            if ok is None:
+                return
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.failures < self.threshold:
+                return
+            first = self.opened_at is None
+            self.opened_at = time.monotonic()
+        if first:
+            print(f"  ⚡ {self.name} 연속 실패 {self.failures}회 - {self.cooldown:.0f}초 동안 호출 중단")
+            _metrics.info.setdefault('breakers', []).append(self.name)
+
+
+class TokenBucket:
+    """초당 호출 수 제한 (스레드 간 공유)"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class QuotaTracker:
+    """일일 호출 수를 파일에 누적 기록 (data.go.kr 한도는 KST 자정에 초기화)"""
+
+    def __init__(self, path: str = QUOTA_PATH, daily_limit: int = API_DAILY_QUOTA):
+        self.path = path
+        self.daily_limit = daily_limit
+        self.lock = threading.Lock()
+        self.date = self._today()
+        self.used = 0
+        try:
+            with open(path, encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get('date') == self.date:
+                self.used = int(saved.get('used', 0))
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone(timedelta(hours=9))).strftime('%Y-%m-%d')
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.daily_limit - self.used)
+
+    def consume(self, n: int = 1):
+        with self.lock:
+            today = self._today()
+            if today != self.date:
+                self.date, self.used = today, 0
+            if self.used + n > self.daily_limit:
+                raise QuotaExceeded(f"일일 호출 한도 {self.daily_limit}건 소진")
+            self.used += n
+
+    def save(self):
+        with self.lock:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'date': self.date, 'used': self.used}, f)
+            os.replace(tmp_path, self.path)
+
+
+_rate_limiter = TokenBucket(API_RATE)
+_quota = None
+_breakers = {}
+
+
+def get_breaker(url: str) -> CircuitBreaker:
+    with _session_lock:
+        if url not in _breakers:
+            _breakers[url] = CircuitBreaker(url.rsplit('/', 1)[-1])
+        return _breakers[url]
+
+
+def get_quota() -> QuotaTracker:
+    global _quota
+    with _session_lock:
+        if _quota is None:
+            _quota = QuotaTracker()
+    return _quota
+
+
+def interleave_regions(jobs: Iterable[FetchJob]) -> List[FetchJob]:
+    """지역별로 번갈아 배치해서 한도가 중간에 끊겨도 특정 지역만 밀리지 않게 함"""
+    by_region = defaultdict(list)
+    for job in dict.fromkeys(jobs):
+        by_region[job[0]].append(job)
+    queues = list(by_region.values())
+    ordered = []
+    for i in range(max((len(q) for q in queues), default=0)):
+        ordered.extend(q[i] for q in queues if i < len(q))
+    return ordered
+
+
+def schedule_fetch(jobs: Iterable[FetchJob], fetch: Callable[..., List[Trade]] = None,
+                   max_workers: int = FETCH_CONCURRENCY, pending_path: str = PENDING_PATH) -> Dict[FetchJob, List[Trade]]:
+    """여러 지역의 (지역, 유형, 계약년월) 조합을 호출 제한에 맞춰 동시에 조회해 dict로 반환"""
+    return dict(iter_schedule(jobs, fetch, max_workers, pending_path))
+
+
+def iter_schedule(jobs: Iterable[FetchJob], fetch: Callable[..., List[Trade]] = None,
+                  max_workers: int = FETCH_CONCURRENCY, pending_path: Optional[str] = PENDING_PATH) -> Iterator[Tuple[FetchJob, List[Trade]]]:
+    """조합을 호출 제한에 맞춰 동시에 조회하고 끝나는 대로 (조합, 결과)를 yield
+
+    지난 실행에서 한도 소진으로 남은 조합을 먼저 처리하고, 이번에도 한도가 소진되면
+    끝내지 못한 조합을 pending_path에 기록해 다음 실행에서 이어서 조회한다 (None이면 기록 안 함).
+    """
+    fetch = fetch or _fetch_month
+    resumed = []
+    if pending_path:
+        try:
+            with open(pending_path, encoding='utf-8') as f:
+                resumed = [tuple(job) for job in json.load(f)]
+        except (OSError, ValueError):
+            pass
+    if resumed:
+        print(f"  이전 실행에서 남은 {len(resumed)}개 조합부터 조회")
+    
+    ordered = interleave_regions(resumed + list(jobs))
+    done = set()
+    quota = get_quota()
+    try:
+        if not ordered:
+            return
+        workers = max(1, min(max_workers, len(ordered)))
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # 한꺼번에 다 넣지 않고 작업자 수의 2배까지만 띄워 둠 - 끝난 결과는 바로 빼서
+            # 여러 해/여러 지역 백필에서도 소비 전 월별 결과만 메모리에 남게 함
+            queue = iter(ordered)
+            futures = {}
+            exhausted = False
+            
+            def refill():
+                while not exhausted and len(futures) < workers * 2:
+                    job = next(queue, None)
+                    if job is None:
+                        return
+                    lawd_cd, ptype, deal_ymd = job
+                    futures[executor.submit(fetch, ptype, deal_ymd, lawd_cd)] = job
+            
+            try:
+                refill()
+                while futures:
+                    finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        job = futures.pop(future)
+                        if future.cancelled():
+                            continue
+                        try:
+                            result = future.result()
+                        except QuotaExceeded as e:
+                            if not exhausted:
+                                print(f"  ⚠️ {e} ({quota.used}/{quota.daily_limit}) - 남은 조합은 다음 실행에서 이어서 조회")
+                                exhausted = True
+                                for f in futures:
+                                    f.cancel()
+                            continue
+                        done.add(job)
+                        yield job, result
+                    refill()
+            finally:
+                for f in futures:
+                    f.cancel()
+    finally:
+        quota.save()
+        if pending_path:
+            remaining = [job for job in ordered if job not in done]
+            if remaining:
+                os.makedirs(os.path.dirname(pending_path) or '.', exist_ok=True)
+                with open(pending_path, 'w', encoding='utf-8') as f:
+                    json.dump(remaining, f)
+            elif os.path.exists(pending_path):
+                os.remove(pending_path)
+
+
+# ============ 거래 저장소 ============
+# 거래 식별키: 지역, 유형, 동, 지번, 이름, 계약일, 금액, 면적, 층, 월세
+STORE_VERSION = 4
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    lawd_cd     TEXT NOT NULL,
+    type        TEXT NOT NULL,
+    dong        TEXT NOT NULL,
+    jibun       TEXT NOT NULL,
+    name        TEXT NOT NULL,
+    deal_date   TEXT NOT NULL,
+    amount      INTEGER NOT NULL,
+    area        REAL NOT NULL,
+    floor       INTEGER NOT NULL,
+    deal_ymd    TEXT NOT NULL,
+    build_year  INTEGER NOT NULL DEFAULT 0,
+    deal_type   TEXT NOT NULL DEFAULT '',
+    synced_at   TEXT NOT NULL,
+    prev_max    INTEGER,
+    ref_median  INTEGER,
+    monthly_rent INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (lawd_cd, type, dong, jibun, name, deal_date, amount, area, floor, monthly_rent)
+);
+CREATE INDEX IF NOT EXISTS trades_month ON trades (lawd_cd, type, deal_ymd);
+CREATE TABLE IF NOT EXISTS months (
+    lawd_cd   TEXT NOT NULL,
+    type      TEXT NOT NULL,
+    deal_ymd  TEXT NOT NULL,
+    rows      INTEGER NOT NULL,
+    closed    INTEGER NOT NULL DEFAULT 0,
+    synced_at TEXT NOT NULL,
+    PRIMARY KEY (lawd_cd, type, deal_ymd)
+);
+CREATE TABLE IF NOT EXISTS price_index (
+    lawd_cd     TEXT NOT NULL,
+    type        TEXT NOT NULL,
+    dong        TEXT NOT NULL,
+    name        TEXT NOT NULL,
+    area_bucket INTEGER NOT NULL,
+    trades      INTEGER NOT NULL,
+    max_amount  INTEGER NOT NULL,
+    max_date    TEXT NOT NULL,
+    last_amount INTEGER NOT NULL,
+    last_date   TEXT NOT NULL,
+    recent      TEXT NOT NULL,
+    median      INTEGER NOT NULL,
+    PRIMARY KEY (lawd_cd, type, dong, name, area_bucket)
+);
+"""
+
+
+
+def open_store(path: str = STORE_PATH) -> sqlite3.Connection:
+    """로컬 거래 저장소 (SQLite) 열기 - 스키마 버전이 다르면 비우고 다시 수집 (마감 표시도 지워져 전부 다시 받음)"""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version != STORE_VERSION:
+        conn.executescript("DROP TABLE IF EXISTS trades; DROP TABLE IF EXISTS months; DROP TABLE IF EXISTS price_index;")
+    conn.executescript(STORE_SCHEMA)
+    if version != STORE_VERSION:
+        conn.execute(f"PRAGMA user_version = {STORE_VERSION}")
+    return conn
+
+
+def is_month_closed(deal_ymd: str, now: datetime = None) -> bool:
+    """신고 기한이 지나 더 이상 거래가 추가되지 않는 달인지"""
+    now = now or datetime.now()
+    year, month = int(deal_ymd[:4]), int(deal_ymd[4:])
+    next_month = datetime(year + month // 12, month % 12 + 1, 1)
+    return now >= next_month + timedelta(days=REPORT_WINDOW_DAYS)
+
+
+def open_months(conn: sqlite3.Connection, jobs: Iterable[FetchJob]) -> List[FetchJob]:
+    """아직 마감되지 않은 (지역, 유형, 계약년월) 조합만 골라냄"""
+    closed = {(row['lawd_cd'], row['type'], row['deal_ymd']) for row in conn.execute(
+        "SELECT lawd_cd, type, deal_ymd FROM months WHERE closed = 1")}
+    return [job for job in dict.fromkeys(jobs) if job not in closed]
+
+
+def store_month(conn: sqlite3.Connection, property_type: str, deal_ymd: str, trades: List[Trade],
+                lawd_cd: str = YEOJU_CODE, now: datetime = None):
+    """한 달치 조회 결과를 저장소에 반영
+
+    같은 식별키는 덮어쓰고(upsert), 이번 조회에 없는 기존 행(해제/정정된 거래)은 지운다.
+    처음 들어온 거래만 시세 인덱스에 반영하고, 지워진 거래가 있던 단지·면적은 인덱스를 다시 계산한다.
+    신고 기한이 지난 달은 마감 표시해서 다음 동기화부터 건너뛴다.
+    """
+    now = now or datetime.now()
+    synced_at = now.isoformat()
+    with conn:
+        existing = {tuple(row) for row in conn.execute(
+            """SELECT dong, jibun, name, deal_date, amount, area, floor, monthly_rent FROM trades
+               WHERE lawd_cd = ? AND type = ? AND deal_ymd = ?""", (lawd_cd, property_type, deal_ymd))}
+        rows = [(t, (t.dong, t.jibun, t.name, t.deal_date.isoformat() if t.deal_date else '',
+                     t.amount, t.area, t.floor, t.monthly_rent)) for t in trades]
+        update_price_index(conn, lawd_cd, property_type, [t for t, key in rows if key not in existing])
+        conn.executemany(
+            """INSERT INTO trades (lawd_cd, type, dong, jibun, name, deal_date, amount, area, floor, monthly_rent,
+                                   deal_ymd, build_year, deal_type, synced_at, prev_max, ref_median)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT DO UPDATE SET build_year = excluded.build_year,
+                                         deal_type = excluded.deal_type,
+                                         synced_at = excluded.synced_at""",
+            [(lawd_cd, property_type, *key, deal_ymd, t.build_year, t.deal_type, synced_at, t.prev_max, t.ref_median)
+             for t, key in rows])
+        removed = {(row['dong'], row['name'], area_bucket(row['area'])) for row in conn.execute(
+            """SELECT dong, name, area FROM trades
+               WHERE lawd_cd = ? AND type = ? AND deal_ymd = ? AND synced_at != ?""",
+            (lawd_cd, property_type, deal_ymd, synced_at))}
+        conn.execute("DELETE FROM trades WHERE lawd_cd = ? AND type = ? AND deal_ymd = ? AND synced_at != ?",
+                     (lawd_cd, property_type, deal_ymd, synced_at))
+        if removed and not is_rent(property_type):
+            rebuild_price_index(conn, lawd_cd, property_type, removed)
+        rows = conn.execute("SELECT COUNT(*) FROM trades WHERE lawd_cd = ? AND type = ? AND deal_ymd = ?",
+                            (lawd_cd, property_type, deal_ymd)).fetchone()[0]
+        conn.execute(
+            """INSERT OR REPLACE INTO months (lawd_cd, type, deal_ymd, rows, closed, synced_at)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (lawd_cd, property_type, deal_ymd, rows, int(is_month_closed(deal_ymd, now)), synced_at))
+    _metrics.count_rows('fetched', lawd_cd, property_type, deal_ymd, len(trades))
+
+
+def _fetch_month(property_type: str, deal_ymd: str, lawd_cd: str = YEOJU_CODE) -> Optional[List[Trade]]:
+    """동기화용 조회 - 실패 시 None (거래 0건과 구분)"""
+    try:
+        return list(iter_trades(property_type, deal_ymd, lawd_cd))
+    except QuotaExceeded:
+        raise
     except Exception as e:
-        print(f"  API Error ({property_type}): {e}")
-        return []
+        print(f"  API Error ({property_type} {deal_ymd}): {_redact(str(e))}")
+        _metrics.error('fetch', f"{lawd_cd} {property_type} {deal_ymd}", e)
+        return None
+
+
+def sync_store(conn: sqlite3.Connection, jobs: Iterable[FetchJob]) -> Dict:
+    """마감되지 않은 달만 다시 받아 저장소에 반영
+
+    {'synced': 갱신한 조합 수, 'failed': 조회 실패/한도 소진으로 못 받은 조합} - 실패한 달은 저장소의
+    지난 자료가 그대로 남는다 (stale_months() 참고).
+    """
+    if not MOLIT_API_KEY:
+        print("  API 키 없음 - 저장소 동기화 생략")
+        return {'synced': 0, 'failed': []}
+    
+    pending = open_months(conn, jobs)
+    results = schedule_fetch(pending, fetch=_fetch_month)
+    synced = 0
+    # 시세 인덱스가 계약일 순으로 쌓이도록 이른 달부터 반영
+    for (lawd_cd, ptype, deal_ymd), trades in sorted(results.items(), key=lambda item: item[0][2]):
+        if trades is None:
+            continue
+        store_month(conn, ptype, deal_ymd, trades, lawd_cd)
+        synced += 1
+    return {'synced': synced, 'failed': [job for job in pending if results.get(job) is None]}
+
+
+def stale_months(conn: sqlite3.Connection, jobs: Iterable[FetchJob]) -> Dict[FetchJob, Optional[str]]:
+    """이번에 못 받은 조합별 마지막 동기화 시각 (한 번도 받은 적 없으면 None - 0건으로 발행하면 안 되는 경우)"""
+    stale = {}
+    for lawd_cd, ptype, deal_ymd in jobs:
+        row = conn.execute("SELECT synced_at FROM months WHERE lawd_cd = ? AND type = ? AND deal_ymd = ?",
+                           (lawd_cd, ptype, deal_ymd)).fetchone()
+        stale[(lawd_cd, ptype, deal_ymd)] = row[0] if row else None
+    return stale
+
+
+_TRADE_COLUMNS = ("type, name, amount, build_year, deal_date, dong, jibun, area, floor, deal_type, prev_max, ref_median, "
+                  "monthly_rent")
+
+
+def _trades_from_rows(rows: Iterable) -> List[Trade]:
+    return [Trade(ptype, name, amount, build_year, date.fromisoformat(deal_date) if deal_date else None,
+                  dong, jibun, area, floor, deal_type, prev_max, ref_median, monthly_rent)
+            for (ptype, name, amount, build_year, deal_date, dong, jibun, area, floor, deal_type, prev_max, ref_median,
+                 monthly_rent) in rows]
+
+
+def load_store(conn: sqlite3.Connection, property_type: str, deal_ymd: str, lawd_cd: str = YEOJU_CODE) -> List[Trade]:
+    """저장소에서 한 달치 거래를 _fetch_month()와 같은 형태로 읽기 (응답 도착 순서와 관계없이 식별키 순)"""
+    return _trades_from_rows(conn.execute(
+        f"""SELECT {_TRADE_COLUMNS} FROM trades WHERE lawd_cd = ? AND type = ? AND deal_ymd = ?
+            ORDER BY dong, jibun, name, deal_date, amount, area, floor, monthly_rent""",
+        (lawd_cd, property_type, deal_ymd)))
+
+
+def load_history(conn: sqlite3.Connection, property_type: str, lawd_cd: str = YEOJU_CODE) -> List[Trade]:
+    """저장소에 있는 한 지역·유형의 전체 거래를 최신 계약일 순으로 읽기 (계약일 없는 거래는 맨 뒤)"""
+    return _trades_from_rows(conn.execute(
+        f"""SELECT {_TRADE_COLUMNS} FROM trades WHERE lawd_cd = ? AND type = ?
+            ORDER BY deal_date IS NULL, deal_date DESC, amount DESC""",
+        (lawd_cd, property_type)))
+
+
+# ============ 단지별 시세 인덱스 ============
+# (지역, 유형, 동, 단지명, 면적 구간)별 최고가/마지막 거래가/최근 PRICE_WINDOW건 중위가를 저장소에 누적
+PRICE_WINDOW = int(os.environ.get('PRICE_WINDOW', '10'))
+# 최근 중위가 대비 이만큼(%) 이상 벗어난 거래는 페이지에 표시
+PRICE_FLAG_PCT = int(os.environ.get('PRICE_FLAG_PCT', '10'))
+
+
+def area_bucket(area: float) -> int:
+    """전용면적 구간 - 1㎡ 단위 반올림 (84.97㎡와 84.99㎡는 같은 평형)"""
+    return int(area + 0.5)
+
+
+def _apply_price(entry: Optional[Dict], t: Trade, prior_max: Optional[int] = None) -> Dict:
+    """인덱스 항목 하나에 거래 1건을 반영하고, 그 거래에 직전 최고가/중위가를 기록
+
+    이미 반영된 마지막 거래보다 계약일이 이른 거래(늦게 신고된 거래, 백필 등)는 항목의 최고가가 그 뒤 거래까지
+    포함하므로 호출자가 준 prior_max(그 계약일 전 거래의 최고가)와 비교하고, 중위가는 최근 PRICE_WINDOW건 중
+    그 전 거래로만 잡는다. prior_max가 없으면 비교 값을 남기지 않는다.
+    """
+    import statistics
+    
+    deal_date = t.deal_date.isoformat()
+    if entry is None:
+        entry = {'trades': 0, 'max_amount': 0, 'max_date': '', 'last_amount': 0, 'last_date': '', 'recent': [], 'median': 0}
+    elif deal_date >= entry['last_date']:
+        t.prev_max, t.ref_median = entry['max_amount'], entry['median']
+    elif prior_max is not None:
+        earlier = [amount for day, amount in entry['recent'] if day < deal_date]
+        t.prev_max, t.ref_median = prior_max, int(statistics.median(earlier)) if earlier else None
+    
+    entry['trades'] += 1
+    if t.amount > entry['max_amount']:
+        entry['max_amount'], entry['max_date'] = t.amount, deal_date
+    if deal_date >= entry['last_date']:
+        entry['last_amount'], entry['last_date'] = t.amount, deal_date
+    recent = sorted(entry['recent'] + [[deal_date, t.amount]])[-PRICE_WINDOW:]
+    entry['recent'] = recent
+    entry['median'] = int(statistics.median(amount for _, amount in recent))
+    return entry
+
+
+def _price_key(t: Trade) -> Tuple[str, str, int]:
+    return t.dong, t.name, area_bucket(t.area)
+
+
+def _save_price_entries(conn: sqlite3.Connection, lawd_cd: str, property_type: str, entries: Dict):
+    conn.executemany(
+        """INSERT OR REPLACE INTO price_index (lawd_cd, type, dong, name, area_bucket, trades, max_amount, max_date,
+                                              last_amount, last_date, recent, median)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        [(lawd_cd, property_type, *key, e['trades'], e['max_amount'], e['max_date'], e['last_amount'], e['last_date'],
+          json.dumps(e['recent']), e['median']) for key, e in entries.items()])
+
+
+def update_price_index(conn: sqlite3.Connection, lawd_cd: str, property_type: str, trades: List[Trade]):
+    """새로 들어온 거래만 계약일 순으로 인덱스에 반영 (해당 단지·면적 항목만 읽고 씀, 이력은 다시 훑지 않음)
+
+    각 거래의 prev_max/ref_median이 채워지므로 저장하기 전에 호출한다. 전월세는 보증금이라 비교하지 않는다.
+    신고는 계약 후 30일까지 들어오므로 항목의 마지막 거래보다 이른 거래도 새로 들어올 수 있다 - 그런 거래는
+    저장된 거래와 이번에 먼저 반영한 거래 중 계약일이 그보다 앞선 것의 최고가와 비교한다 (계약일이 같은 거래는 제외).
+    """
+    if is_rent(property_type):
+        return
+    priced = sorted((t for t in trades if t.amount > 0 and t.deal_date),
+                    key=lambda t: (t.sort_key, t.dong, t.jibun, t.name, t.amount, t.area, t.floor))
+    entries = {}
+    applied = defaultdict(list)
+    for t in priced:
+        key = _price_key(t)
+        if key not in entries:
+            row = conn.execute(
+                """SELECT trades, max_amount, max_date, last_amount, last_date, recent, median FROM price_index
+                   WHERE lawd_cd = ? AND type = ? AND dong = ? AND name = ? AND area_bucket = ?""",
+                (lawd_cd, property_type, *key)).fetchone()
+            entries[key] = dict(row, recent=json.loads(row['recent'])) if row else None
+        deal_date = t.deal_date.isoformat()
+        prior_max = None
+        if entries[key] and deal_date < entries[key]['last_date']:
+            dong, name, bucket = key
+            stored, = conn.execute(
+                """SELECT MAX(amount) FROM trades WHERE lawd_cd = ? AND type = ? AND dong = ? AND name = ?
+                   AND area >= ? AND area < ? AND amount > 0 AND deal_date != '' AND deal_date < ?""",
+                (lawd_cd, property_type, dong, name, bucket - 0.5, bucket + 0.5, deal_date)).fetchone()
+            earlier = [amount for day, amount in applied[key] if day < deal_date] + ([stored] if stored else [])
+            prior_max = max(earlier) if earlier else None
+        entries[key] = _apply_price(entries[key], t, prior_max)
+        applied[key].append((deal_date, t.amount))
+    _save_price_entries(conn, lawd_cd, property_type, entries)
+
+
+def rebuild_price_index(conn: sqlite3.Connection, lawd_cd: str, property_type: str,
+                        keys: Iterable[Tuple[str, str, int]]):
+    """keys(동, 단지명, 면적 구간) 항목의 인덱스를 저장된 거래로 다시 계산하고 거래별 비교 값도 다시 씀
+    (거래가 지워져 최고가를 되돌려야 할 때)
+    """
+    for dong, name, bucket in keys:
+        conn.execute("DELETE FROM price_index WHERE lawd_cd = ? AND type = ? AND dong = ? AND name = ? AND area_bucket = ?",
+                     (lawd_cd, property_type, dong, name, bucket))
+        entries = {}
+        flagged = []
+        for rowid, *row in conn.execute(
+                f"""SELECT rowid, {_TRADE_COLUMNS} FROM trades
+                    WHERE lawd_cd = ? AND type = ? AND dong = ? AND name = ? AND area >= ? AND area < ?
+                      AND amount > 0 AND deal_date != ''
+                    ORDER BY deal_date, dong, jibun, name, amount, area, floor""",
+                (lawd_cd, property_type, dong, name, bucket - 0.5, bucket + 0.5)).fetchall():
+            t, = _trades_from_rows([row])
+            t.prev_max = t.ref_median = None
+            key = _price_key(t)
+            entries[key] = _apply_price(entries.get(key), t)
+            flagged.append((t.prev_max, t.ref_median, rowid))
+        _save_price_entries(conn, lawd_cd, property_type, entries)
+        conn.executemany("UPDATE trades SET prev_max = ?, ref_median = ? WHERE rowid = ?", flagged)
+
 
+# ============ 과거 데이터 백필 ============
+BACKFILL_CHECKPOINT_PATH = os.path.join(CACHE_DIR, 'backfill_checkpoint.txt')
 
-def get_text(element, tag: str) -> str:
-    el = element.find(tag)
-    if el is not None and el.text:
-        return el.text.strip()
-    return ''
+
+def month_range(start_ym: str, end_ym: str) -> List[str]:
+    """YYYYMM ~ YYYYMM (양끝 포함) 월 목록"""
+    year, month = int(start_ym[:4]), int(start_ym[4:])
+    end_year, end_month = int(end_ym[:4]), int(end_ym[4:])
+    months = []
+    while (year, month) <= (end_year, end_month):
+        months.append(f"{year:04d}{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def prev_month(ym: str) -> str:
+    """YYYYMM의 지난 달"""
+    year, month = int(ym[:4]), int(ym[4:])
+    return f"{year - 1:04d}12" if month == 1 else f"{year:04d}{month - 1:02d}"
+
+
+def _load_checkpoint(path: str) -> set:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return {tuple(line.split()) for line in f if line.strip()}
+    except OSError:
+        return set()
+
+
+def backfill(conn: sqlite3.Connection, start_ym: str, end_ym: str, ptypes: List[str], regions: List[str],
+             workers: int = FETCH_CONCURRENCY, checkpoint_path: str = BACKFILL_CHECKPOINT_PATH) -> Dict:
+    """기간 내 모든 (지역, 유형, 월)을 병렬로 받아 저장소에 채움
+
+    끝난 조합은 checkpoint_path에 한 줄씩 기록하므로 중간에 끊겨도 다시 실행하면 남은 조합만 받는다.
+    조회/매핑은 sync_store()와 같은 iter_trades() 경로를 그대로 쓴다.
+    """
+    if not MOLIT_API_KEY:
+        print("  API 키 없음 - 백필 생략")
+        return {'months': 0, 'rows': 0, 'failed': 0, 'seconds': 0.0}
+    
+    # 저장소가 초기화된 경우를 위해 저장소에도 남아 있는 조합만 완료로 인정
+    stored = {tuple(row) for row in conn.execute("SELECT lawd_cd, type, deal_ymd FROM months")}
+    done = _load_checkpoint(checkpoint_path) & stored
+    units = [(lawd_cd, ptype, ym) for ym in month_range(start_ym, end_ym)
+             for lawd_cd in regions for ptype in ptypes]
+    todo = [unit for unit in open_months(conn, units) if unit not in done]
+    print(f"  백필 {start_ym}~{end_ym}: 전체 {len(units)}개 중 {len(todo)}개 조회 (완료 {len(units) - len(todo)}개)")
+    
+    if os.path.dirname(checkpoint_path):
+        os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+    started = time.monotonic()
+    months = rows = failed = 0
+    with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+        for (lawd_cd, ptype, ym), trades in iter_schedule(todo, fetch=_fetch_month, max_workers=workers, pending_path=None):
+            if trades is None:
+                failed += 1
+                continue
+            store_month(conn, ptype, ym, trades, lawd_cd)
+            checkpoint.write(f"{lawd_cd} {ptype} {ym}\n")
+            checkpoint.flush()
+            months += 1
+            rows += len(trades)
+            if months % 50 == 0:
+                elapsed = time.monotonic() - started
+                print(f"  ... {months}/{len(todo)}개 · {months / elapsed:.2f} months/s · {rows / elapsed:.1f} rows/s")
+    
+    elapsed = time.monotonic() - started
+    print(f"  ✅ 백필 {months}개 조합 · {rows}건 · {elapsed:.1f}s "
+          f"({months / elapsed if elapsed else 0:.2f} months/s, {rows / elapsed if elapsed else 0:.1f} rows/s)"
+          + (f" · 실패 {failed}개" if failed else ""))
+    return {'months': months, 'rows': rows, 'failed': failed, 'seconds': elapsed}
+
+
+# ============ 분석용 내보내기 ============
+# <out_dir>/lawd_cd=<코드>/type=<유형>/ym=<YYYYMM>/part-0.<parquet|arrow> (hive 파티션)
+# 파티션 값은 경로에만 있고 파일에는 거래 열만 들어간다. 파일 정보는 _export_state.json (밑줄 파일은 리더가 무시)
+EXPORT_STATE_FILE = '_export_state.json'
+EXPORT_EXTENSIONS = {'parquet': 'parquet', 'arrow': 'arrow'}
+
+
+def _export_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('name', pa.string()),
+        ('dong', pa.string()),
+        ('jibun', pa.string()),
+        ('deal_date', pa.date32()),
+        ('amount', pa.int64()),          # 만원 (전월세는 보증금)
+        ('monthly_rent', pa.int64()),    # 만원 (매매/전세는 0)
+        ('area', pa.float64()),          # ㎡
+        ('floor', pa.int32()),
+        ('build_year', pa.int32()),
+        ('deal_type', pa.string()),
+        ('prev_max', pa.int64()),        # 직전 최고가 (비교 대상 없으면 null)
+        ('ref_median', pa.int64()),      # 최근 중위가
+    ])
+
+
+def _export_table(conn: sqlite3.Connection, lawd_cd: str, property_type: str, deal_ymd: str):
+    """한 달치 거래를 열 단위 Arrow 테이블로 (저장소 행을 Trade로 만들지 않고 바로 옮김)"""
+    import pyarrow as pa
+    schema = _export_schema()
+    rows = conn.execute(
+        f"""SELECT {', '.join(schema.names)} FROM trades WHERE lawd_cd = ? AND type = ? AND deal_ymd = ?
+            ORDER BY deal_date, dong, jibun, name, amount, area, floor, monthly_rent""",
+        (lawd_cd, property_type, deal_ymd)).fetchall()
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    arrays = {name: list(values) for name, values in zip(schema.names, columns)}
+    arrays['deal_date'] = [date.fromisoformat(d) if d else None for d in arrays['deal_date']]
+    return pa.table(arrays, schema=schema)
+
+
+def _write_export_file(table, path: str, fmt: str):
+    """임시 파일에 쓰고 바꿔 끼움 - 읽는 쪽이 쓰다 만 파일을 보지 않도록"""
+    import pyarrow as pa
+    tmp = path + '.tmp'
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, tmp, compression='zstd')
+    else:
+        # Arrow IPC는 압축 없이 써서 메모리 매핑으로 바로 읽히게 함
+        with pa.OSFile(tmp, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def export_store(conn: sqlite3.Connection, out_dir: str, fmt: str = EXPORT_FORMAT,
+                 regions: List[str] = None, ptypes: List[str] = None) -> Dict:
+    """저장소의 거래를 (지역, 유형, 계약년월) 파티션 파일로 내보냄 - 지난 내보내기 이후 다시 동기화된 달만 새로 씀
+
+    {'written': 새로 쓴 파티션 수, 'rows': 그 행 수, 'skipped': 그대로인 파티션 수}
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("  ⚠️ pyarrow 없음 - 내보내기 생략 (pip install pyarrow)")
+        return {'written': 0, 'rows': 0, 'skipped': 0}
+    if fmt not in EXPORT_EXTENSIONS:
+        raise ValueError(f"알 수 없는 내보내기 형식: {fmt} (parquet 또는 arrow)")
+    
+    os.makedirs(out_dir, exist_ok=True)
+    state_path = os.path.join(out_dir, EXPORT_STATE_FILE)
+    try:
+        with open(state_path, encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    # 형식이 바뀌면 전부 다시 씀
+    exported = state.get('months', {}) if state.get('format') == fmt else {}
+    
+    written = rows = skipped = 0
+    for lawd_cd, ptype, deal_ymd, synced_at in conn.execute(
+            "SELECT lawd_cd, type, deal_ymd, synced_at FROM months ORDER BY lawd_cd, type, deal_ymd").fetchall():
+        if (regions and lawd_cd not in regions) or (ptypes and ptype not in ptypes):
+            continue
+        key = f"{lawd_cd}/{ptype}/{deal_ymd}"
+        partition = os.path.join(out_dir, f"lawd_cd={lawd_cd}", f"type={ptype}", f"ym={deal_ymd}")
+        path = os.path.join(partition, f"part-0.{EXPORT_EXTENSIONS[fmt]}")
+        if exported.get(key) == synced_at and os.path.exists(path):
+            skipped += 1
+            continue
+        table = _export_table(conn, lawd_cd, ptype, deal_ymd)
+        os.makedirs(partition, exist_ok=True)
+        _write_export_file(table, path, fmt)
+        for ext in set(EXPORT_EXTENSIONS.values()) - {EXPORT_EXTENSIONS[fmt]}:
+            # 다른 형식으로 쓴 예전 파일이 남으면 Dataset이 한 파티션에 두 형식을 보게 됨
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(partition, f"part-0.{ext}"))
+        exported[key] = synced_at
+        written += 1
+        rows += table.num_rows
+    
+    with open(state_path, 'w', encoding='utf-8') as f:
+        json.dump({'format': fmt, 'months': exported}, f, ensure_ascii=False, indent=1)
+    print(f"  📦 내보내기 {out_dir}: 파티션 {written}개 새로 씀 ({rows}건), {skipped}개 그대로")
+    return {'written': written, 'rows': rows, 'skipped': skipped}
+
+
+def open_export(out_dir: str, fmt: str = EXPORT_FORMAT):
+    """내보낸 파일을 pyarrow Dataset으로 열기 - 파티션 열(lawd_cd/type/ym)은 문자열, 파일은 메모리 매핑
+
+    예: open_export('export').to_table(filter=(ds.field('type') == 'apt') & (ds.field('ym') >= '202401'))
+    필터에 걸리지 않는 파티션 파일은 열지 않는다.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+    partitioning = ds.partitioning(pa.schema([('lawd_cd', pa.string()), ('type', pa.string()), ('ym', pa.string())]),
+                                   flavor='hive')
+    return ds.dataset(out_dir, format='parquet' if fmt == 'parquet' else 'ipc', partitioning=partitioning,
+                      filesystem=fs.LocalFileSystem(use_mmap=True))
 
 
 # ============ 유틸리티 ============
@@ -158,8 +1581,256 @@ def get_week_of_month():
     return (adjusted_dom - 1) // 7 + 1
 
 
+# ============ 통계 ============
+# 페이지에 보여줄 최신 거래 수
+TOP_K = 20
+
+
+def compute_stats(trades: List[Trade], top_k: int = TOP_K) -> Dict:
+    """유형별 통계 - 최신 top_k건은 힙으로 부분 선택, 금액 분포는 NumPy 배열로 한 번에 계산
+
+    금액은 만원 단위, per_m2는 ㎡당 평균 금액(만원). 금액이 있는 거래가 없으면 분포 항목은 빠진다.
+    """
+    import numpy as np
+    
+    recent = heapq.nlargest(top_k, trades, key=lambda t: t.sort_key)
+    
+    n = len(trades)
+    amounts = np.fromiter((t.amount for t in trades), dtype=np.int64, count=n)
+    areas = np.fromiter((t.area for t in trades), dtype=np.float64, count=n)
+    
+    stats = {'count': n, 'recent': recent}
+    priced = amounts > 0
+    prices = amounts[priced]
+    if prices.size:
+        p10, median, p90 = np.percentile(prices, [10, 50, 90])
+        stats.update(avg=int(prices.mean()), max=int(prices.max()),
+                     median=int(median), p10=int(p10), p90=int(p90))
+    
+    with_area = priced & (areas > 0)
+    if with_area.any():
+        stats['per_m2'] = float((amounts[with_area] / areas[with_area]).mean())
+    return stats
+
+
+def _short_or_dash(amount: Optional[int]) -> str:
+    return format_price_short(amount) if amount is not None else '-'
+
+
+def print_store_stats(conn: sqlite3.Connection, regions: List[str], ptypes: List[str], months: List[str]):
+    """저장소만 읽어 (지역 × 유형 × 월) 건수/평균/중위/최고 출력 - API 호출·NumPy 없이 SQL 집계로 바로 끝남
+
+    전월세 금액은 보증금이고, 월세가 있는 거래는 평균 월세를 덧붙인다. 동기화한 적 없는 달은 '미수집'.
+    """
+    synced = {(row['lawd_cd'], row['type'], row['deal_ymd']): row for row in conn.execute(
+        "SELECT lawd_cd, type, deal_ymd, closed, synced_at FROM months")}
+    for lawd_cd in regions:
+        print(f"📊 {region_name(lawd_cd)} ({lawd_cd})")
+        for ptype in ptypes:
+            print(f"  {DATASETS[ptype]['icon']} {TYPE_LABELS[ptype]}")
+            for ym in months:
+                month = synced.get((lawd_cd, ptype, ym))
+                if month is None:
+                    print(f"    {ym}  미수집")
+                    continue
+                n, avg, top, rent = conn.execute(
+                    """SELECT COUNT(*), AVG(NULLIF(amount, 0)), MAX(amount), AVG(NULLIF(monthly_rent, 0)) FROM trades
+                       WHERE lawd_cd = ? AND type = ? AND deal_ymd = ?""", (lawd_cd, ptype, ym)).fetchone()
+                priced = [row[0] for row in conn.execute(
+                    """SELECT amount FROM trades WHERE lawd_cd = ? AND type = ? AND deal_ymd = ? AND amount > 0
+                       ORDER BY amount""", (lawd_cd, ptype, ym))]
+                median = (priced[(len(priced) - 1) // 2] + priced[len(priced) // 2]) // 2 if priced else None
+                print(f"    {ym}  {n:>5}건  평균 {_short_or_dash(int(avg) if avg else None):>9}"
+                      f"  중위 {_short_or_dash(median):>9}  최고 {_short_or_dash(top or None):>9}"
+                      + (f"  월세 평균 {int(rent)}" if rent else '')
+                      + f"  ({'마감' if month['closed'] else '수집'} {month['synced_at'][:16].replace('T', ' ')})")
+
+
+# ============ 신규 거래 감지 ============
+# 지난 실행에서 본 거래의 지문(상위 16비트 = 계약년월, 하위 48비트 = 식별키 해시)을 정렬된 uint64 배열로 저장
+FINGERPRINT_PATH = os.path.join(CACHE_DIR, 'fingerprints.bin')
+
+
+def trade_fingerprint(t: Trade) -> int:
+    """거래 식별키(저장소 기본키와 같은 항목)의 64비트 지문 - 계약년월을 앞에 둬서 월 단위로 모여 정렬됨
+
+    월세는 있을 때만 키에 붙여서 매매 거래의 지문은 월세 열이 생기기 전과 같다.
+    """
+    key = '|'.join(map(str, (t.type, t.dong, t.jibun, t.name, t.deal_date.isoformat() if t.deal_date else '',
+                             t.amount, t.area, t.floor) + ((t.monthly_rent,) if t.monthly_rent else ())))
+    digest = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=6).digest(), 'big')
+    month = t.deal_date.year * 12 + t.deal_date.month - 1 if t.deal_date else 0
+    return month << 48 | digest
+
+
+def _fingerprint_month(deal_ymd: str) -> int:
+    return int(deal_ymd[:4]) * 12 + int(deal_ymd[4:]) - 1
+
+
+def load_fingerprints(path: str = FINGERPRINT_PATH) -> Optional[array]:
+    """지난 실행의 지문 배열 - 파일이 없으면(첫 실행) None"""
+    fingerprints = array('Q')
+    try:
+        with open(path, 'rb') as f:
+            fingerprints.frombytes(f.read())
+    except (OSError, ValueError):
+        return None
+    return fingerprints
+
+
+def save_fingerprints(fingerprints: Iterable[int], path: str = FINGERPRINT_PATH):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        array('Q', sorted(set(fingerprints))).tofile(f)
+    os.replace(tmp_path, path)
+
+
+def diff_sorted(previous: array, current: List[int]) -> Tuple[List[int], List[int]]:
+    """정렬된 두 지문 배열을 한 번씩만 훑어 (새로 생긴 것, 없어진 것)을 구함"""
+    added, removed = [], []
+    i = j = 0
+    while i < len(previous) and j < len(current):
+        if previous[i] == current[j]:
+            i += 1
+            j += 1
+        elif previous[i] < current[j]:
+            removed.append(previous[i])
+            i += 1
+        else:
+            added.append(current[j])
+            j += 1
+    removed.extend(previous[i:])
+    added.extend(current[j:])
+    return added, removed
+
+
+def compute_delta(trades: Dict[str, List[Trade]], months: Iterable[str], path: str = FINGERPRINT_PATH) -> Dict:
+    """이번에 본 거래(months 기간)와 지난 실행의 지문을 비교
+
+    신고가 늦게 들어온 지난 달 거래도 계약일과 관계없이 새 거래로 잡힌다. 없어진 거래(해제/정정)는
+    months 기간 안의 지문만 센다 - 기간 밖으로 밀려난 달은 해제된 것이 아니므로.
+    반환: previous(비교 대상 유무), new(새 지문 집합), new_trades(유형별), removed(없어진 건수), fingerprints(저장할 값)
+    """
+    window = {_fingerprint_month(ym) for ym in months}
+    by_fingerprint = {trade_fingerprint(t): t for ptype_trades in trades.values() for t in ptype_trades}
+    current = sorted(by_fingerprint)
+    previous = load_fingerprints(path)
+    if previous is None:
+        return {'previous': False, 'new': set(), 'new_trades': {}, 'removed': 0, 'fingerprints': current}
+    
+    added, removed = diff_sorted(previous, current)
+    new_trades = defaultdict(list)
+    for fingerprint in added:
+        t = by_fingerprint[fingerprint]
+        new_trades[t.type].append(t)
+    return {
+        'previous': True,
+        'new': set(added),
+        'new_trades': dict(new_trades),
+        'removed': sum(1 for fingerprint in removed if fingerprint >> 48 in window),
+        'fingerprints': current,
+    }
+
+
+# ============ 검색 인덱스 ============
+# 페이지에서 항목 객체를 훑지 않고 바로 답할 수 있도록 빌드 시점에 만드는 역색인 + 정렬된 숫자 열
+CHOSEONG = 'ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ'
+
+# 필터 구간 (면적 ㎡, 금액 만원) - 상한 None은 제한 없음
+AREA_BANDS = [(0, 60), (60, 85), (85, 135), (135, 330), (330, None)]
+PRICE_BANDS = [(0, 10000), (10000, 30000), (30000, 60000), (60000, 90000), (90000, None)]
+
+
+def choseong(text: str) -> str:
+    """한글 음절을 초성으로 바꿈 ('여주자이' -> 'ㅇㅈㅈㅇ'), 그 밖의 문자는 그대로"""
+    return ''.join(CHOSEONG[(ord(c) - 0xAC00) // 588] if '가' <= c <= '힣' else c for c in text)
+
+
+def search_tokens(item: Dict) -> set:
+    """단지명/동에서 뽑은 색인어 - 단어별, 공백을 뺀 전체, 그리고 각각의 초성형"""
+    tokens = set()
+    for text in (item['name'], item['dong']):
+        words = re.findall(r'[0-9a-z가-힣]+', text.lower())
+        for word in words + [''.join(words)]:
+            if word:
+                tokens.add(word)
+                tokens.add(choseong(word))
+    return tokens
+
+
+def _delta(ids: List[int]) -> List[int]:
+    """오름차순 id 목록을 앞 값과의 차이로 (JSON 크기 절약)"""
+    return [b - a for a, b in zip([0] + ids, ids)]
+
+
+def build_search_index(items: List[Dict]) -> Dict:
+    """카드 목록(순서 = id)에 대한 검색 인덱스
+
+    keys는 정렬된 색인어(접두어 검색은 이진 탐색 후 범위 순회), postings는 keys와 같은 순서의 delta 인코딩 id 목록,
+    facets는 동/거래유형별 id 목록, ranges는 면적/금액 오름차순으로 정렬한 id와 값 (구간 필터는 이진 탐색 두 번).
+    """
+    postings = defaultdict(list)
+    facets = {'dong': defaultdict(list), 'dealType': defaultdict(list)}
+    for i, item in enumerate(items):
+        for token in search_tokens(item):
+            postings[token].append(i)
+        for name, values in facets.items():
+            values[item[name]].append(i)
+    
+    keys = sorted(postings)
+    ranges = {}
+    for field in ('area', 'price'):
+        order = sorted(range(len(items)), key=lambda i: items[i][field])
+        ranges[field] = {'ids': order, 'values': [items[i][field] for i in order]}
+    return {
+        'n': len(items),
+        'keys': keys,
+        'postings': [_delta(postings[key]) for key in keys],
+        'facets': {name: {value: _delta(ids) for value, ids in sorted(values.items())}
+                   for name, values in facets.items()},
+        'ranges': ranges,
+    }
+
+
 # ============ HTML 생성 ============
-def generate_html(data: Dict) -> str:
+def trade_item(t: Trade, today: date, new: set = None) -> Dict:
+    """카드 1장에 들어갈 JSON (계약일은 ISO 형식)
+
+    new(지난 실행 이후 새로 본 거래의 지문)가 있으면 거기 든 거래가 isNew, 없으면(첫 실행) 최근 3일 내 거래.
+    isHigh는 같은 단지·면적의 신고가, vsMedian은 최근 중위가 대비 차이(%)로 PRICE_FLAG_PCT 이상일 때만 넣는다.
+    전월세는 price가 보증금이고 monthlyRent(만원, 전세는 0)가 붙으며, 거래유형은 전세/월세·계약구분이다.
+    """
+    vs_median = round((t.amount / t.ref_median - 1) * 100) if t.ref_median else 0
+    if is_rent(t.type):
+        deal_type = ('월세' if t.monthly_rent else '전세') + (f"·{t.deal_type}" if t.deal_type else '')
+    else:
+        deal_type = t.deal_type or '중개거래'
+    item = {
+        'name': t.name,
+        'dong': t.dong,
+        'area': t.area,
+        'floor': t.floor,
+        'price': t.amount,
+        'buildYear': t.build_year,
+        'dealDate': t.deal_date.isoformat() if t.deal_date else '',
+        'dealType': deal_type,
+        'isNew': trade_fingerprint(t) in new if new is not None
+                 else t.deal_date is not None and (today - t.deal_date).days <= 3,
+        'isHigh': t.is_record_high,
+        'vsMedian': vs_median if abs(vs_median) >= PRICE_FLAG_PCT else 0
+    }
+    if is_rent(t.type):
+        item['monthlyRent'] = t.monthly_rent
+    return item
+
+
+def build_payload(data: Dict, new: set = None, stale: Dict[str, str] = None) -> Dict:
+    """페이지에 넣을 JSON 데이터 (기간/업데이트 시각 + 유형별 통계와 카드 목록), new는 trade_item() 참고
+
+    stale: 이번에 조회하지 못해 지난 수집 자료를 쓴 유형 -> 그 수집 시각 (페이지에 표시)
+    """
     now = datetime.now()
     year = now.year
     month = now.month
@@ -174,51 +1845,113 @@ def generate_html(data: Dict) -> str:
         'updateTime': update_time,
     }
     
-    for ptype in ['apt', 'villa', 'house', 'land']:
+    today = now.date()
+    for ptype in ENABLED_TYPES:
         trades = data.get(ptype, [])
-        amounts = [parse_amount(t['deal_amount']) for t in trades if parse_amount(t['deal_amount']) > 0]
-        
-        # 최신순 정렬
-        sorted_trades = sorted(trades, key=lambda x: (
-            int(x['deal_year'] or 0),
-            int(x['deal_month'] or 0),
-            int(x['deal_day'] or 0)
-        ), reverse=True)[:20]
-        
-        # 최근 3일 내 거래 체크
-        items = []
-        for t in sorted_trades:
-            try:
-                deal_date = datetime(int(t['deal_year']), int(t['deal_month']), int(t['deal_day']))
-                is_new = (now - deal_date).days <= 3
-            except:
-                is_new = False
-            
-            items.append({
-                'name': t['name'],
-                'dong': t['dong'],
-                'area': float(t['area']) if t['area'] else 0,
-                'floor': int(t['floor']) if t['floor'] else 0,
-                'price': parse_amount(t['deal_amount']),
-                'buildYear': int(t['build_year']) if t['build_year'] else 0,
-                'dealDate': f"{t['deal_month']}/{t['deal_day']}",
-                'dealType': t['deal_type'] or '중개거래',
-                'isNew': is_new
-            })
+        stats = compute_stats(trades)
+        items = [trade_item(t, today, new) for t in stats['recent']]
         
         json_data[ptype] = {
-            'total': len(trades),
-            'avg': format_price_short(int(sum(amounts) / len(amounts))) if amounts else '-',
-            'max': format_price_short(max(amounts)) if amounts else '-',
-            'items': items
+            'total': stats['count'],
+            'avg': _short_or_dash(stats.get('avg')),
+            'max': _short_or_dash(stats.get('max')),
+            'median': _short_or_dash(stats.get('median')),
+            'range': f"{_short_or_dash(stats.get('p10'))} ~ {_short_or_dash(stats.get('p90'))}" if 'p10' in stats else '-',
+            'perM2': f"{stats['per_m2']:,.0f}만" if 'per_m2' in stats else '-',
+            'items': items,
+            'index': build_search_index(items)
         }
+        if is_rent(ptype):
+            # 전월세의 ㎡당 금액 자리에는 월세 거래의 평균 월세
+            rents = [t.monthly_rent for t in trades if t.monthly_rent]
+            json_data[ptype]['monthlyAvg'] = f"{round(sum(rents) / len(rents)):,}만" if rents else '-'
+        if stale and ptype in stale:
+            json_data[ptype]['staleSince'] = stale[ptype]
+    return json_data
+
+
+def _band_label(lo: int, hi: Optional[int], fmt: Callable[[int], str]) -> str:
+    if hi is None:
+        return f"{fmt(lo)} 이상"
+    return f"{fmt(hi)} 이하" if lo == 0 else f"{fmt(lo)} ~ {fmt(hi)}"
+
+
+def _filter_bar(ptype: str) -> str:
+    """유형별 검색/필터 입력 (동/거래유형 목록은 검색 인덱스를 받은 뒤 채움)"""
+    def options(bands, fmt):
+        return ''.join(f'<option value="{lo}-{hi or ""}">{_band_label(lo, hi, fmt)}</option>' for lo, hi in bands)
+    
+    area_options = options(AREA_BANDS, lambda v: f"{v}㎡")
+    price_options = options(PRICE_BANDS, format_price_short)
+    price_label = '전체 보증금' if is_rent(ptype) else '전체 금액'
+    on_change = f"applyFilters('{ptype}')"
+    return f'''<div class="filters" id="{ptype}-filters">
+            <input type="search" id="{ptype}-q" placeholder="단지명·동 검색 (초성 가능)" oninput="{on_change}">
+            <select id="{ptype}-dong" onchange="{on_change}"><option value="">전체 동</option></select>
+            <select id="{ptype}-area" onchange="{on_change}"><option value="">전체 면적</option>{area_options}</select>
+            <select id="{ptype}-price" onchange="{on_change}"><option value="">{price_label}</option>{price_options}</select>
+            <select id="{ptype}-dealType" onchange="{on_change}"><option value="">전체 거래유형</option></select>
+        </div>'''
+
+
+def _type_css() -> str:
+    """등록된 데이터셋별 탭 건수/헤더/금액 색"""
+    rules = []
+    for ptype, d in DATASETS.items():
+        grad_from, grad_to, border = d['header']
+        rules.append(f"""        .tab[data-type="{ptype}"] .count {{ color: {d['color']}; }}
+        .header.{ptype} {{ background: linear-gradient(135deg, {grad_from}, {grad_to}); border-color: {border}; }}
+        .header.{ptype} .stat .value {{ color: {d['color']}; }}
+        .card-price.{ptype} {{ color: {d['color']}; }}""")
+    return '\n'.join(rules)
+
+
+def _type_tab(ptype: str, active: bool) -> str:
+    return f"""        <div class="tab{' active' if active else ''}" data-type="{ptype}" onclick="switchTab('{ptype}')">
+            {DATASETS[ptype]['label']}<span class="count" id="{ptype}-count">0</span>
+        </div>
+"""
+
+
+def _type_section(ptype: str, active: bool) -> str:
+    """유형 탭 하나의 헤더(통계)/필터/목록 - 전월세는 금액 통계가 보증금 기준이고 ㎡당 평균 대신 평균 월세"""
+    d = DATASETS[ptype]
+    if is_rent(ptype):
+        avg, top, median, extra = '평균 보증금', '최고 보증금', '중위 보증금', '평균 월세'
+    else:
+        avg, top, median, extra = '평균가', '최고가', '중위가', '㎡당 평균'
+    return f"""    <div id="content-{ptype}" class="content{' active' if active else ''}">
+        <div class="header {ptype}">
+            <h1>{d['icon']} {region_name()} {d['label']} 실거래가</h1>
+            <p class="subtitle" id="{ptype}-period"></p>
+            <div class="stats">
+                <div class="stat"><div class="label">거래건수</div><div class="value" id="{ptype}-total">0건</div></div>
+                <div class="stat"><div class="label">{avg}</div><div class="value" id="{ptype}-avg">-</div></div>
+                <div class="stat"><div class="label">{top}</div><div class="value" id="{ptype}-max">-</div></div>
+            </div>
+            <div class="stats">
+                <div class="stat"><div class="label">{median}</div><div class="value" id="{ptype}-median">-</div></div>
+                <div class="stat"><div class="label">하위10%~상위10%</div><div class="value" id="{ptype}-range">-</div></div>
+                <div class="stat"><div class="label">{extra}</div><div class="value" id="{ptype}-perm2">-</div></div>
+            </div>
+        </div>
+        {_filter_bar(ptype)}
+        <p class="list-info" id="{ptype}-info"></p>
+        <div class="list" id="{ptype}-list"></div>
+    </div>
     
+"""
+
+
+def render_page(payload: Dict = None) -> str:
+    """페이지 HTML - payload가 없으면 data/ 아래 JSON을 탭별로 불러오는 정적 셸"""
+    inline = json.dumps(payload, ensure_ascii=False) if payload else 'null'
     html = f'''<!DOCTYPE html>
 <html lang="ko">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>여주시 부동산 실거래가</title>
+    <title>{region_name()} 부동산 실거래가</title>
     <style>
         * {{ margin: 0; padding: 0; box-sizing: border-box; }}
         ::-webkit-scrollbar {{ width: 8px; height: 8px; }}
@@ -235,11 +1968,13 @@ def generate_html(data: Dict) -> str:
         }}
         .tabs {{
             display: flex;
+            flex-wrap: wrap;
             gap: 6px;
             margin-bottom: 12px;
         }}
         .tab {{
             flex: 1;
+            min-width: 64px;
             padding: 10px 6px;
             background: #1a1a1a;
             border: 1px solid #333;
@@ -263,10 +1998,7 @@ def generate_html(data: Dict) -> str:
             font-weight: 700;
             margin-top: 2px;
         }}
-        .tab[data-type="apt"] .count {{ color: #c084fc; }}
-        .tab[data-type="villa"] .count {{ color: #60a5fa; }}
-        .tab[data-type="house"] .count {{ color: #4ade80; }}
-        .tab[data-type="land"] .count {{ color: #fbbf24; }}
+{_type_css()}
         .header {{
             background: linear-gradient(135deg, #4a1d6a, #1a0a2e);
             border: 1px solid #6b3d99;
@@ -274,9 +2006,6 @@ def generate_html(data: Dict) -> str:
             padding: 16px;
             margin-bottom: 12px;
         }}
-        .header.villa {{ background: linear-gradient(135deg, #1e3a5f, #0f1f33); border-color: #3b82f6; }}
-        .header.house {{ background: linear-gradient(135deg, #14532d, #0a2615); border-color: #22c55e; }}
-        .header.land {{ background: linear-gradient(135deg, #713f12, #3d2106); border-color: #f59e0b; }}
         .header h1 {{ font-size: 16px; margin-bottom: 2px; }}
         .header .subtitle {{ font-size: 11px; color: rgba(255,255,255,0.5); margin-bottom: 12px; }}
         .stats {{
@@ -290,12 +2019,28 @@ def generate_html(data: Dict) -> str:
             border-radius: 6px;
             padding: 8px 4px;
         }}
+        .stats + .stats {{ margin-top: 8px; }}
         .stat .label {{ font-size: 10px; color: rgba(255,255,255,0.5); }}
         .stat .value {{ font-size: 14px; font-weight: 700; color: #c084fc; }}
-        .header.villa .stat .value {{ color: #60a5fa; }}
-        .header.house .stat .value {{ color: #4ade80; }}
-        .header.land .stat .value {{ color: #fbbf24; }}
-        .list {{ display: flex; flex-direction: column; gap: 6px; }}
+        .filters {{
+            display: grid;
+            grid-template-columns: repeat(2, 1fr);
+            gap: 6px;
+            margin-bottom: 8px;
+        }}
+        .filters input, .filters select {{
+            width: 100%;
+            padding: 8px;
+            background: #141414;
+            border: 1px solid #333;
+            border-radius: 6px;
+            color: #e5e5e5;
+            font-size: 12px;
+        }}
+        .filters input {{ grid-column: 1 / -1; }}
+        .list-info {{ font-size: 11px; color: #555; margin: 0 2px 8px; }}
+        .list {{ position: relative; }}
+        .list .card {{ position: absolute; top: 0; left: 0; right: 0; transition: transform 0.3s ease-out; }}
         .card {{
             background: #141414;
             border: 1px solid #252525;
@@ -335,9 +2080,15 @@ def generate_html(data: Dict) -> str:
             border-radius: 4px;
             flex-shrink: 0;
         }}
+        .badge.high {{ background: rgba(248, 113, 113, 0.15); color: #f87171; border-color: rgba(248, 113, 113, 0.3); }}
+        .badge.up {{ background: rgba(251, 146, 60, 0.12); color: #fb923c; border-color: rgba(251, 146, 60, 0.3); }}
+        .badge.down {{ background: rgba(96, 165, 250, 0.12); color: #60a5fa; border-color: rgba(96, 165, 250, 0.3); }}
         .card-meta {{
             font-size: 11px;
             color: #666;
+            white-space: nowrap;
+            overflow: hidden;
+            text-overflow: ellipsis;
         }}
         .card-meta span {{ margin-right: 6px; }}
         .card-right {{
@@ -348,10 +2099,6 @@ def generate_html(data: Dict) -> str:
             gap: 8px;
         }}
         .card-price {{ font-size: 14px; font-weight: 700; }}
-        .card-price.apt {{ color: #c084fc; }}
-        .card-price.villa {{ color: #60a5fa; }}
-        .card-price.house {{ color: #4ade80; }}
-        .card-price.land {{ color: #fbbf24; }}
         .arrow {{
             width: 18px;
             height: 18px;
@@ -366,6 +2113,7 @@ def generate_html(data: Dict) -> str:
             background: #0f0f0f;
         }}
         .card.open .card-detail {{ max-height: 250px; }}
+        .card.placeholder {{ background: #111; border-color: #1c1c1c; cursor: default; }}
         .card-detail-inner {{
             padding: 12px;
             border-top: 1px solid #222;
@@ -389,85 +2137,33 @@ def generate_html(data: Dict) -> str:
             color: #555;
             font-size: 12px;
         }}
-        .content {{ display: none; }}
-        .content.active {{ display: block; }}
-    </style>
-</head>
-<body>
-    <div class="tabs">
-        <div class="tab active" data-type="apt" onclick="switchTab('apt')">
-            아파트<span class="count" id="apt-count">0</span>
-        </div>
-        <div class="tab" data-type="villa" onclick="switchTab('villa')">
-            연립/다세대<span class="count" id="villa-count">0</span>
-        </div>
-        <div class="tab" data-type="house" onclick="switchTab('house')">
-            단독/다가구<span class="count" id="house-count">0</span>
-        </div>
-        <div class="tab" data-type="land" onclick="switchTab('land')">
-            토지<span class="count" id="land-count">0</span>
-        </div>
-    </div>
-    
-    <div id="content-apt" class="content active">
-        <div class="header">
-            <h1>🏢 여주시 아파트 실거래가</h1>
-            <p class="subtitle" id="apt-period"></p>
-            <div class="stats">
-                <div class="stat"><div class="label">거래건수</div><div class="value" id="apt-total">0건</div></div>
-                <div class="stat"><div class="label">평균가</div><div class="value" id="apt-avg">-</div></div>
-                <div class="stat"><div class="label">최고가</div><div class="value" id="apt-max">-</div></div>
-            </div>
-        </div>
-        <div class="list" id="apt-list"></div>
-    </div>
-    
-    <div id="content-villa" class="content">
-        <div class="header villa">
-            <h1>🏘️ 여주시 연립/다세대 실거래가</h1>
-            <p class="subtitle" id="villa-period"></p>
-            <div class="stats">
-                <div class="stat"><div class="label">거래건수</div><div class="value" id="villa-total">0건</div></div>
-                <div class="stat"><div class="label">평균가</div><div class="value" id="villa-avg">-</div></div>
-                <div class="stat"><div class="label">최고가</div><div class="value" id="villa-max">-</div></div>
-            </div>
-        </div>
-        <div class="list" id="villa-list"></div>
-    </div>
-    
-    <div id="content-house" class="content">
-        <div class="header house">
-            <h1>🏠 여주시 단독/다가구 실거래가</h1>
-            <p class="subtitle" id="house-period"></p>
-            <div class="stats">
-                <div class="stat"><div class="label">거래건수</div><div class="value" id="house-total">0건</div></div>
-                <div class="stat"><div class="label">평균가</div><div class="value" id="house-avg">-</div></div>
-                <div class="stat"><div class="label">최고가</div><div class="value" id="house-max">-</div></div>
-            </div>
-        </div>
-        <div class="list" id="house-list"></div>
-    </div>
-    
-    <div id="content-land" class="content">
-        <div class="header land">
-            <h1>🌳 여주시 토지 실거래가</h1>
-            <p class="subtitle" id="land-period"></p>
-            <div class="stats">
-                <div class="stat"><div class="label">거래건수</div><div class="value" id="land-total">0건</div></div>
-                <div class="stat"><div class="label">평균가</div><div class="value" id="land-avg">-</div></div>
-                <div class="stat"><div class="label">최고가</div><div class="value" id="land-max">-</div></div>
-            </div>
-        </div>
-        <div class="list" id="land-list"></div>
+        .content {{ display: none; }}
+        .content.active {{ display: block; }}
+    </style>
+</head>
+<body>
+    <div class="tabs">
+{''.join(_type_tab(ptype, i == 0) for i, ptype in enumerate(ENABLED_TYPES))}
     </div>
     
+{''.join(_type_section(ptype, i == 0) for i, ptype in enumerate(ENABLED_TYPES))}
     <div class="footer">
         자료: <a href="https://rt.molit.go.kr" target="_blank">국토교통부 실거래가 공개시스템</a><br>
         <span id="update-time"></span>
     </div>
 
     <script>
-        const DATA = {json.dumps(json_data, ensure_ascii=False)};
+        const INLINE = {inline};
+        const TYPES = {json.dumps(ENABLED_TYPES)};
+        let DATA = null;
+        let CURRENT_YEAR = 0;
+        // 목록은 가상 스크롤: 카드 높이가 고정이라 보이는 범위(+여유분)만 DOM에 두고,
+        // 청크 파일은 끝에 가까워질 때 다음 것을 받아 이어 붙임 (무한 스크롤)
+        const ROW_GAP = 6;
+        const OVERSCAN = 8;
+        const PREFETCH_ROWS = 40;
+        let rowHeight = 0;
+        const views = {{}};
         
         function formatPrice(amount) {{
             if (amount >= 10000) {{
@@ -480,75 +2176,325 @@ def generate_html(data: Dict) -> str:
         
         function toPyeong(area) {{ return (area / 3.3058).toFixed(1); }}
         
+        function formatDealDate(iso, full) {{
+            if (!iso) return '';
+            const [y, m, d] = iso.split('-').map(Number);
+            return full || y !== CURRENT_YEAR ? `${{y}}.${{m}}.${{d}}` : `${{m}}/${{d}}`;
+        }}
+        
         function switchTab(type) {{
             document.querySelectorAll('.tab').forEach(t => t.classList.remove('active'));
             document.querySelector(`.tab[data-type="${{type}}"]`).classList.add('active');
             document.querySelectorAll('.content').forEach(c => c.classList.remove('active'));
             document.getElementById(`content-${{type}}`).classList.add('active');
+            renderList(type);
+        }}
+        
+        function createView(type) {{
+            const items = INLINE ? INLINE[type].items : null;
+            return {{
+                type,
+                list: document.getElementById(`${{type}}-list`),
+                count: items ? items.length : DATA[type].count,
+                chunkSize: items ? Math.max(items.length, 1) : DATA.chunkSize,
+                chunks: items ? [items] : [],
+                pending: {{}},
+                loaded: items ? items.length : 0,  // 앞에서부터 이어 받은 건수 = 무한 스크롤 길이
+                ids: null,                          // 필터 결과 행 번호 목록 (null이면 전체를 순서대로)
+                index: INLINE ? INLINE[type].index : null,
+                nodes: new Map(),
+                openPos: -1,
+                openExtra: 0,
+                failed: false
+            }};
+        }}
+        
+        // 청크는 탭을 열거나 스크롤이 끝에 닿을 때 해당 파일만 받아서 씀
+        function loadChunk(view, c) {{
+            if (view.chunks[c] || view.pending[c]) return;
+            view.pending[c] = fetch('data/' + DATA.files[view.type][c])
+                .then(r => {{ if (!r.ok) throw new Error(r.status); return r.json(); }})
+                .then(d => {{
+                    view.chunks[c] = d.items;
+                    let k = 0;
+                    while (view.chunks[k]) k++;
+                    view.loaded = Math.min(view.count, k * view.chunkSize);
+                    view.failed = false;
+                }})
+                .catch(() => {{ view.failed = true; }})
+                .then(() => {{ delete view.pending[c]; scheduleRender(); }});
+        }}
+        
+        function loadIndex(view) {{
+            if (view.index || !DATA.index[view.type]) return;
+            fetch('data/' + DATA.index[view.type])
+                .then(r => {{ if (!r.ok) throw new Error(r.status); return r.json(); }})
+                .then(index => {{ view.index = index; fillFacets(view); applyFilters(view.type); }})
+                .catch(() => {{}});
+        }}
+        
+        function itemAt(view, pos) {{
+            const i = view.ids ? view.ids[pos] : pos;
+            const chunk = view.chunks[Math.floor(i / view.chunkSize)];
+            if (!chunk) loadChunk(view, Math.floor(i / view.chunkSize));
+            return chunk ? chunk[i % view.chunkSize] : null;
+        }}
+        
+        function viewLength(view) {{
+            return view.ids ? view.ids.length : view.loaded;
+        }}
+        
+        // 펼친 카드가 있으면 그 아래 카드는 상세 영역 높이만큼 밀림
+        function rowTop(view, pos) {{
+            const stride = rowHeight + ROW_GAP;
+            return pos * stride + (view.openPos >= 0 && pos > view.openPos ? view.openExtra : 0);
+        }}
+        
+        function rowAt(view, y) {{
+            const stride = rowHeight + ROW_GAP;
+            let pos = Math.floor(y / stride);
+            if (view.openPos >= 0 && pos > view.openPos) pos = Math.max(view.openPos, Math.floor((y - view.openExtra) / stride));
+            return Math.max(0, Math.min(viewLength(view) - 1, pos));
+        }}
+        
+        function createNode(view, pos) {{
+            const item = itemAt(view, pos);
+            const el = document.createElement('div');
+            if (item) {{
+                el.className = pos === view.openPos ? 'card open' : 'card';
+                el.innerHTML = createCard(item, view.type);
+                el.onclick = () => toggleCard(view.type, pos);
+            }} else {{
+                el.className = 'card placeholder';
+                el.style.height = rowHeight + 'px';
+            }}
+            el.style.transform = `translateY(${{rowTop(view, pos)}}px)`;
+            view.list.appendChild(el);
+            return el;
+        }}
+        
+        function renderView(view) {{
+            const list = view.list;
+            const length = viewLength(view);
+            if (length === 0) {{
+                view.nodes.forEach(el => list.removeChild(el));
+                view.nodes.clear();
+                list.style.height = '';
+                list.innerHTML = view.failed
+                    ? '<div class="empty">데이터를 불러오지 못했습니다</div>'
+                    : view.ids ? '<div class="empty">조건에 맞는 거래가 없습니다</div>'
+                    : view.count === 0 ? `<div class="empty">${{DATA.history ? '' : '이번 달 '}}거래 내역이 없습니다</div>` : '';
+                return;
+            }}
+            if (!view.nodes.size) list.innerHTML = '';
+            if (!rowHeight) {{
+                // 첫 카드로 행 높이를 잼 (숨겨진 상태라 0이면 기본값)
+                const probe = createNode(view, 0);
+                rowHeight = probe.offsetHeight || 64;
+                list.removeChild(probe);
+            }}
+            list.style.height = (rowTop(view, length - 1) + rowHeight + (view.openPos === length - 1 ? view.openExtra : 0)) + 'px';
+            
+            const listTop = list.getBoundingClientRect().top + window.scrollY;
+            const first = Math.max(0, rowAt(view, window.scrollY - listTop) - OVERSCAN);
+            const last = Math.min(length - 1, rowAt(view, window.scrollY - listTop + window.innerHeight) + OVERSCAN);
+            
+            view.nodes.forEach((el, pos) => {{
+                if (pos < first || pos > last || (el.className === 'card placeholder' && itemAt(view, pos))) {{
+                    list.removeChild(el);
+                    view.nodes.delete(pos);
+                }}
+            }});
+            for (let pos = first; pos <= last; pos++) {{
+                if (!view.nodes.has(pos)) view.nodes.set(pos, createNode(view, pos));
+            }}
+            
+            if (!view.ids && view.loaded < view.count && last >= view.loaded - PREFETCH_ROWS) {{
+                loadChunk(view, Math.floor(view.loaded / view.chunkSize));
+            }}
+        }}
+        
+        let renderQueued = false;
+        function scheduleRender() {{
+            if (renderQueued) return;
+            renderQueued = true;
+            requestAnimationFrame(() => {{
+                renderQueued = false;
+                const view = views[document.querySelector('.tab.active').dataset.type];
+                if (view) renderView(view);
+            }});
+        }}
+        
+        function renderList(type) {{
+            if (!views[type]) {{
+                const view = views[type] = createView(type);
+                document.getElementById(`${{type}}-filters`).style.display = view.count ? '' : 'none';
+                if (INLINE) fillFacets(view);
+                else if (view.count) {{ loadChunk(view, 0); loadIndex(view); }}
+            }}
+            renderView(views[type]);
+        }}
+        
+        // ---- 검색/필터: 빌드 시점에 만든 인덱스(정렬된 색인어, delta id 목록, 정렬된 숫자 열)로만 답함 ----
+        function decodeIds(deltas, mark) {{
+            let id = 0;
+            for (let i = 0; i < deltas.length; i++) {{ id += deltas[i]; mark(id); }}
+        }}
+        
+        function lowerBound(arr, x) {{
+            let lo = 0, hi = arr.length;
+            while (lo < hi) {{
+                const mid = (lo + hi) >> 1;
+                if (arr[mid] < x) lo = mid + 1; else hi = mid;
+            }}
+            return lo;
+        }}
+        
+        // 색인어 접두어 검색 (초성 색인어도 같은 목록에 있어 'ㅇㅈ'처럼 입력해도 됨)
+        function prefixSet(index, word) {{
+            return mark => {{
+                for (let i = lowerBound(index.keys, word); i < index.keys.length && index.keys[i].startsWith(word); i++) {{
+                    decodeIds(index.postings[i], mark);
+                }}
+            }};
         }}
         
-        function toggleCard(card) {{
-            const wasOpen = card.classList.contains('open');
-            document.querySelectorAll('.card.open').forEach(c => c.classList.remove('open'));
-            if (!wasOpen) {{
+        function rangeSet(column, band) {{
+            const [lo, hi] = band.split('-');
+            const from = lowerBound(column.values, Number(lo));
+            const to = hi ? lowerBound(column.values, Number(hi)) : column.values.length;
+            return mark => {{ for (let i = from; i < to; i++) mark(column.ids[i]); }};
+        }}
+        
+        // 조건별 id 집합의 교집합 - 조건 j까지 모두 맞은 id만 hits가 j+1이 되고, 결과는 원래(최신순) 순서
+        function intersect(n, sets) {{
+            const hits = new Uint8Array(n);
+            sets.forEach((each, j) => each(id => {{ if (hits[id] === j) hits[id] = j + 1; }}));
+            const ids = [];
+            for (let i = 0; i < n; i++) if (hits[i] === sets.length) ids.push(i);
+            return ids;
+        }}
+        
+        function fillFacets(view) {{
+            ['dong', 'dealType'].forEach(name => {{
+                const select = document.getElementById(`${{view.type}}-${{name}}`);
+                Object.keys(view.index.facets[name]).forEach(value => {{
+                    const option = document.createElement('option');
+                    option.value = option.textContent = value;
+                    select.appendChild(option);
+                }});
+            }});
+        }}
+        
+        function listInfo(type) {{
+            const count = INLINE ? INLINE[type].items.length : DATA[type].count;
+            return DATA.history ? `전체 거래 ${{count.toLocaleString()}}건 · 최신순` : `최근 거래 ${{count}}건`;
+        }}
+        
+        function applyFilters(type) {{
+            const view = views[type];
+            if (!view || !view.index) return;
+            const index = view.index;
+            const value = name => document.getElementById(`${{type}}-${{name}}`).value;
+            const sets = (value('q').toLowerCase().match(/[0-9a-z가-힣ㄱ-ㅎ]+/g) || []).map(word => prefixSet(index, word));
+            ['dong', 'dealType'].forEach(name => {{
+                const ids = value(name) && index.facets[name][value(name)];
+                if (ids) sets.push(mark => decodeIds(ids, mark));
+            }});
+            ['area', 'price'].forEach(name => {{
+                if (value(name)) sets.push(rangeSet(index.ranges[name], value(name)));
+            }});
+            
+            view.ids = sets.length ? intersect(index.n, sets) : null;
+            view.openPos = -1;
+            view.nodes.forEach(el => view.list.removeChild(el));
+            view.nodes.clear();
+            document.getElementById(`${{type}}-info`).textContent = view.ids
+                ? `검색 결과 ${{view.ids.length.toLocaleString()}}건` : listInfo(type);
+            renderView(view);
+        }}
+        
+        function toggleCard(type, pos) {{
+            const view = views[type];
+            const prev = view.nodes.get(view.openPos);
+            if (prev) prev.classList.remove('open');
+            view.openPos = view.openPos === pos ? -1 : pos;
+            const card = view.nodes.get(view.openPos);
+            if (card) {{
                 card.classList.add('open');
-                setTimeout(() => card.scrollIntoView({{ behavior: 'smooth', block: 'nearest' }}), 100);
+                view.openExtra = card.querySelector('.card-detail-inner').offsetHeight;
             }}
+            view.nodes.forEach((el, p) => {{ el.style.transform = `translateY(${{rowTop(view, p)}}px)`; }});
+            renderView(view);
+            if (card) setTimeout(() => card.scrollIntoView({{ behavior: 'smooth', block: 'nearest' }}), 300);
+        }}
+        
+        // 전월세는 price가 보증금, monthlyRent가 월세 (전세는 0)
+        function formatRent(item) {{
+            return item.monthlyRent ? `${{formatPrice(item.price)}} / 월 ${{item.monthlyRent.toLocaleString()}}만원`
+                : `전세 ${{formatPrice(item.price)}}`;
         }}
         
         function createCard(item, type) {{
             const pyeong = toPyeong(item.area);
-            const priceText = formatPrice(item.price);
-            const badge = item.isNew ? '<span class="badge">NEW</span>' : '';
+            const rent = item.monthlyRent !== undefined;
+            const priceText = rent ? formatRent(item) : formatPrice(item.price);
+            const badge = (item.isNew ? '<span class="badge">NEW</span>' : '')
+                + (item.isHigh ? '<span class="badge high">신고가</span>' : '')
+                + (item.vsMedian > 0 ? `<span class="badge up">시세 +${{item.vsMedian}}%</span>` : '')
+                + (item.vsMedian < 0 ? `<span class="badge down">시세 ${{item.vsMedian}}%</span>` : '');
             const floor = item.floor ? `${{item.floor}}층` : '';
             
             return `
-                <div class="card" onclick="toggleCard(this)">
-                    <div class="card-main">
-                        <div class="card-left">
-                            <div class="card-name"><span>${{item.name}}</span>${{badge}}</div>
-                            <div class="card-meta">
-                                <span>${{item.dong}}</span>
-                                <span>${{item.area}}㎡(${{pyeong}}평)</span>
-                                ${{floor ? `<span>${{floor}}</span>` : ''}}
-                                <span>${{item.dealDate}}</span>
-                            </div>
-                        </div>
-                        <div class="card-right">
-                            <div class="card-price ${{type}}">${{priceText}}</div>
-                            <svg class="arrow" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
-                                <path d="M19 9l-7 7-7-7"/>
-                            </svg>
+                <div class="card-main">
+                    <div class="card-left">
+                        <div class="card-name"><span>${{item.name}}</span>${{badge}}</div>
+                        <div class="card-meta">
+                            <span>${{item.dong}}</span>
+                            <span>${{item.area}}㎡(${{pyeong}}평)</span>
+                            ${{floor ? `<span>${{floor}}</span>` : ''}}
+                            <span>${{formatDealDate(item.dealDate)}}</span>
                         </div>
                     </div>
-                    <div class="card-detail">
-                        <div class="card-detail-inner">
-                            <div class="detail-item"><span class="label">전용면적</span><span class="value">${{item.area}}㎡ (${{pyeong}}평)</span></div>
-                            <div class="detail-item"><span class="label">거래금액</span><span class="value">${{priceText}}</span></div>
-                            ${{item.floor ? `<div class="detail-item"><span class="label">층수</span><span class="value">${{item.floor}}층</span></div>` : ''}}
-                            ${{item.buildYear ? `<div class="detail-item"><span class="label">건축년도</span><span class="value">${{item.buildYear}}년</span></div>` : ''}}
-                            <div class="detail-item"><span class="label">계약일</span><span class="value">2025.${{item.dealDate}}</span></div>
-                            <div class="detail-item"><span class="label">거래유형</span><span class="value">${{item.dealType}}</span></div>
-                        </div>
+                    <div class="card-right">
+                        <div class="card-price ${{type}}">${{priceText}}</div>
+                        <svg class="arrow" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                            <path d="M19 9l-7 7-7-7"/>
+                        </svg>
+                    </div>
+                </div>
+                <div class="card-detail">
+                    <div class="card-detail-inner">
+                        <div class="detail-item"><span class="label">전용면적</span><span class="value">${{item.area}}㎡ (${{pyeong}}평)</span></div>
+                        <div class="detail-item"><span class="label">${{rent ? '보증금/월세' : '거래금액'}}</span><span class="value">${{priceText}}</span></div>
+                        ${{item.floor ? `<div class="detail-item"><span class="label">층수</span><span class="value">${{item.floor}}층</span></div>` : ''}}
+                        ${{item.buildYear ? `<div class="detail-item"><span class="label">건축년도</span><span class="value">${{item.buildYear}}년</span></div>` : ''}}
+                        <div class="detail-item"><span class="label">계약일</span><span class="value">${{formatDealDate(item.dealDate, true)}}</span></div>
+                        <div class="detail-item"><span class="label">거래유형</span><span class="value">${{item.dealType}}</span></div>
                     </div>
                 </div>
             `;
         }}
         
-        function init() {{
-            ['apt', 'villa', 'house', 'land'].forEach(type => {{
+        async function init() {{
+            DATA = INLINE || await fetch('data/manifest.json', {{ cache: 'no-cache' }}).then(r => r.json());
+            CURRENT_YEAR = parseInt(DATA.updateTime, 10);
+            TYPES.forEach(type => {{
                 const d = DATA[type];
                 document.getElementById(`${{type}}-count`).textContent = d.total;
                 document.getElementById(`${{type}}-total`).textContent = `${{d.total}}건`;
                 document.getElementById(`${{type}}-avg`).textContent = d.avg;
                 document.getElementById(`${{type}}-max`).textContent = d.max;
-                document.getElementById(`${{type}}-period`).textContent = DATA.period + ' 기준 · 국토교통부';
-                
-                const list = document.getElementById(`${{type}}-list`);
-                list.innerHTML = d.items.length === 0 
-                    ? '<div class="empty">이번 달 거래 내역이 없습니다</div>'
-                    : d.items.map(item => createCard(item, type)).join('');
+                document.getElementById(`${{type}}-median`).textContent = d.median;
+                document.getElementById(`${{type}}-range`).textContent = d.range;
+                document.getElementById(`${{type}}-perm2`).textContent = d.monthlyAvg || d.perM2;
+                document.getElementById(`${{type}}-period`).textContent = DATA.period + ' 기준 · 국토교통부'
+                    + (d.staleSince ? ` · ⚠️ API 장애로 ${{d.staleSince}} 수집 자료` : '');
+                document.getElementById(`${{type}}-info`).textContent = listInfo(type);
             }});
+            window.addEventListener('scroll', scheduleRender, {{ passive: true }});
+            window.addEventListener('resize', scheduleRender);
+            renderList(document.querySelector('.tab.active').dataset.type);
             document.getElementById('update-time').textContent = '업데이트: ' + DATA.updateTime;
         }}
         
@@ -560,111 +2506,601 @@ def generate_html(data: Dict) -> str:
     return html
 
 
-# ============ 섬네일 생성 ============
-def create_thumbnail(apt_count, villa_count, house_count, land_count, output_path="thumbnail.png"):
+# ============ 정적 사이트 ============
+# index.html은 데이터가 없는 고정 셸, 데이터는 data/ 아래 manifest + 유형별 해시 파일명 JSON
+SITE_DATA_DIR = 'data'
+
+
+def _write_precompressed(path: str, body: bytes):
+    """원본과 함께 .gz(그리고 brotli가 있으면 .br) 사전 압축본을 씀"""
+    with open(path, 'wb') as f:
+        f.write(body)
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(body, compresslevel=9, mtime=0))
     try:
-        from PIL import Image, ImageDraw, ImageFont
+        import brotli
     except ImportError:
-        print("  Pillow 없음 - 섬네일 생략")
-        return None
-    
-    width, height = 1200, 630
-    img = Image.new('RGB', (width, height), '#0f0f1a')
-    draw = ImageDraw.Draw(img)
+        return
+    with open(path + '.br', 'wb') as f:
+        f.write(brotli.compress(body, quality=11))
+
+
+def _json_bytes(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def write_hashed_json(data_dir: str, prefix: str, obj) -> str:
+    """내용 해시를 파일명에 넣어 저장 (이미 있으면 그대로 둠) - 파일명 반환"""
+    body = _json_bytes(obj)
+    name = f"{prefix}.{hashlib.sha256(body).hexdigest()[:10]}.json"
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path):
+        _write_precompressed(path, body)
+    return name
+
+
+def write_site(data: Dict, out_dir: str = '.', history: Dict[str, List[Trade]] = None,
+               chunk_size: int = HISTORY_CHUNK_SIZE, new: set = None, stale: Dict[str, str] = None) -> Dict:
+    """정적 셸(index.html) + 유형별 데이터 파일 생성, 참조되지 않는 이전 해시 파일은 정리
+
+    셸은 실행마다 바뀌지 않아 브라우저/CDN 캐시가 유지되고, 바뀌는 건 작은 manifest와 데이터 파일뿐이다.
+    카드 목록은 chunk_size건씩 나눈 청크 파일로 저장하고, history(유형별 최신순 전체 거래)가 있으면
+    최신 TOP_K건 대신 전체를 싣는다. 검색 인덱스는 유형별로 따로 두고 목록과 같은 id(순서)를 쓴다.
+    """
+    payload = build_payload(data, new, stale)
+    data_dir = os.path.join(out_dir, SITE_DATA_DIR)
+    os.makedirs(data_dir, exist_ok=True)
     
-    # 그라데이션 배경
-    for y in range(height):
-        r = int(15 + (y / height) * 15)
-        g = int(15 + (y / height) * 8)
-        b = int(26 + (y / height) * 25)
-        draw.line([(0, y), (width, y)], fill=(r, g, b))
+    ptypes = ENABLED_TYPES
+    today = datetime.now().date()
+    manifest = {key: value for key, value in payload.items() if key not in ptypes}
+    manifest.update(history=history is not None, chunkSize=chunk_size, files={}, index={})
+    for ptype in ptypes:
+        summary = dict(payload[ptype])
+        items = summary.pop('items')
+        index = summary.pop('index')
+        if history is not None:
+            items = [trade_item(t, today, new) for t in history.get(ptype, [])]
+            index = build_search_index(items)
+        if items:
+            manifest['index'][ptype] = write_hashed_json(data_dir, f"{ptype}-index", index)
+        summary['count'] = len(items)
+        manifest[ptype] = summary
+        manifest['files'][ptype] = [
+            write_hashed_json(data_dir, f"{ptype}-{i // chunk_size}", {'items': items[i:i + chunk_size]})
+            for i in range(0, len(items), chunk_size)
+        ]
+    _write_precompressed(os.path.join(data_dir, 'manifest.json'), _json_bytes(manifest))
     
-    draw.ellipse([(-150, -150), (250, 250)], fill='#2d1f4e')
-    draw.ellipse([(950, 450), (1350, 850)], fill='#1a1a3e')
+    referenced = {name for names in manifest['files'].values() for name in names}
+    referenced.update(manifest['index'].values())
+    for name in os.listdir(data_dir):
+        base = name[:-3] if name.endswith(('.gz', '.br')) else name
+        if re.fullmatch(r'.+\.[0-9a-f]{10}\.json', base) and base not in referenced:
+            os.remove(os.path.join(data_dir, name))
     
-    # 폰트
+    shell = render_page()
+    index_path = os.path.join(out_dir, 'index.html')
     try:
-        font_bold_lg = ImageFont.truetype("/usr/share/fonts/truetype/nanum/NanumSquareRoundB.ttf", 64)
-        font_bold_md = ImageFont.truetype("/usr/share/fonts/truetype/nanum/NanumSquareRoundB.ttf", 44)
-        font_count = ImageFont.truetype("/usr/share/fonts/truetype/nanum/NanumSquareRoundB.ttf", 48)
-        font_label = ImageFont.truetype("/usr/share/fonts/truetype/nanum/NanumSquareRoundR.ttf", 22)
-    except:
-        print("  폰트 없음 - 섬네일 생략")
-        return None
+        with open(index_path, encoding='utf-8') as f:
+            unchanged = f.read() == shell
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        with open(index_path, 'w', encoding='utf-8') as f:
+            f.write(shell)
+    return manifest
+
+
+def write_delta_feed(delta: Dict, out_dir: str = '.') -> str:
+    """지난 실행 이후 새로 들어온 거래만 담은 data/delta.json (구독/알림용), 경로 반환"""
+    today = datetime.now().date()
+    feed = {
+        'updateTime': datetime.now().strftime('%Y-%m-%d %H:%M'),
+        'previous': delta['previous'],
+        'removed': delta['removed'],
+        'new': {ptype: [trade_item(t, today, delta['new']) for t in sorted(trades, key=lambda t: t.sort_key, reverse=True)]
+                for ptype, trades in delta['new_trades'].items()},
+    }
+    data_dir = os.path.join(out_dir, SITE_DATA_DIR)
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, 'delta.json')
+    _write_precompressed(path, _json_bytes(feed))
+    return path
+
+
+# ============ 섬네일 생성 ============
+# 정적 배경 레이어가 바뀌면 올려서 캐시된 배경 PNG를 무효화
+THUMB_TEMPLATE_VERSION = 2
+
+# 섬네일 박스는 최대 4칸 - 등록부에서 thumb 배경이 있는 유형만 (create_thumbnail은 앞에서부터 4개 고정)
+THUMB_MAX_TYPES = 4
+THUMB_DEFAULT_TYPES = [ptype for ptype, d in DATASETS.items() if 'thumb' in d][:THUMB_MAX_TYPES]
+
+
+def thumb_types() -> List[str]:
+    """섬네일에 넣을 유형 - 수집하는 데이터셋 중 thumb 배경이 있는 것 (꺼진 유형은 빈 칸으로 싣지 않음)"""
+    return [ptype for ptype in ENABLED_TYPES if 'thumb' in DATASETS[ptype]][:THUMB_MAX_TYPES]
+
+
+def _thumb_category(ptype: str) -> Tuple[str, str, str]:
+    d = DATASETS[ptype]
+    return d['label'], d['color'], d['thumb']
+
+# SNS 이미지 변형: layout은 row(4칸 가로), grid(2×2), single(유형 하나)
+# per가 'type'이면 유형마다, 'region'이면 수집 지역마다 한 장씩 만든다
+THUMB_VARIANTS = [
+    {'name': 'og', 'size': (1200, 630), 'layout': 'row'},
+    {'name': 'square', 'size': (1080, 1080), 'layout': 'grid'},
+    {'name': 'type', 'size': (1080, 1080), 'layout': 'single', 'per': 'type'},
+    {'name': 'region', 'size': (1200, 630), 'layout': 'row', 'per': 'region'},
+]
+THUMB_DIR = 'thumbnails'
+THUMB_FORMATS = ('png', 'webp')
+# 워드프레스 대표 이미지로 올릴 형식
+THUMB_UPLOAD_FORMAT = os.environ.get('THUMB_UPLOAD_FORMAT', 'png')
+
+_thumb_backgrounds = {}
+_thumb_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _load_font(path: str, size: int):
+    from PIL import ImageFont
+    return ImageFont.truetype(path, size)
+
+
+def _thumbnail_fonts() -> Dict:
+    return {
+        'bold_lg': _load_font(FONT_BOLD, 64),
+        'bold_md': _load_font(FONT_BOLD, 44),
+        'count': _load_font(FONT_BOLD, 48),
+        'count_lg': _load_font(FONT_BOLD, 120),
+        'label': _load_font(FONT_REGULAR, 22),
+        'label_lg': _load_font(FONT_REGULAR, 36),
+    }
+
+
+def _thumb_geometry(layout: str, width: int, height: int, n: int = THUMB_MAX_TYPES) -> Dict:
+    """레이아웃별 좌표 - n은 유형 칸 수, 가운데 정렬 (row 4칸은 기존 1200×630 배치 그대로)"""
+    if layout == 'row':
+        box_y, box_h, box_w, gap = 310, 160, 220, 35
+        start_x = (width - (box_w * n + gap * (n - 1))) // 2
+        boxes = [(start_x + i * (box_w + gap), box_y, box_w, box_h) for i in range(n)]
+        return {'icon': (100, 120), 'title_y': 135, 'month_y': 210, 'rule_y': 260,
+                'boxes': boxes, 'label_dy': 45, 'count_dy': 105, 'brand_y': (height - 80, height - 35)}
     
-    now = datetime.now()
-    month = now.month
+    top = {'icon': (100, 140), 'title_y': 155, 'month_y': 240, 'rule_y': 300,
+           'brand_y': (height - 120, height - 75)}
+    if layout == 'grid':
+        box_w, box_h, gap = 400, 240, 40
+        cols = min(n, 2)
+        start_x, start_y = (width - (box_w * cols + gap * (cols - 1))) // 2, 360
+        boxes = [(start_x + (i % 2) * (box_w + gap), start_y + (i // 2) * (box_h + gap), box_w, box_h) for i in range(n)]
+        return {**top, 'boxes': boxes, 'label_dy': 70, 'count_dy': 150}
+    # single
+    return {**top, 'boxes': [(140, 360, width - 280, 480)], 'label_dy': 80, 'count_dy': 230, 'avg_dy': 370}
+
+
+def _render_thumbnail_background(spec: Dict, fonts: Dict):
+    """그라데이션/장식/아이콘/제목/박스/로고 등 값이 바뀌지 않는 부분만 그린 배경"""
+    from PIL import Image, ImageDraw
+    
+    width, height = spec['size']
+    geo = _thumb_geometry(spec['layout'], width, height, len(spec.get('types', ())))
+    
+    # 그라데이션 배경: 1px 폭 세로 띠를 한 번에 늘려서 채움
+    column = Image.new('RGB', (1, height))
+    column.putdata([(int(15 + (y / height) * 15), int(15 + (y / height) * 8), int(26 + (y / height) * 25))
+                    for y in range(height)])
+    img = column.resize((width, height), Image.NEAREST)
+    draw = ImageDraw.Draw(img)
+    
+    draw.ellipse([(-150, -150), (250, 250)], fill='#2d1f4e')
+    draw.ellipse([(width - 250, height - 180), (width + 150, height + 220)], fill='#1a1a3e')
     
     # 집 아이콘
-    ix, iy = 100, 120
+    ix, iy = geo['icon']
     draw.polygon([(ix, iy+30), (ix+40, iy), (ix+80, iy+30)], fill='#c084fc')
     draw.rectangle([ix+10, iy+30, ix+70, iy+70], fill='#c084fc')
     draw.rectangle([ix+30, iy+45, ix+50, iy+70], fill='#1a1a2e')
     
-    draw.text((width//2 + 30, 135), "여주시 부동산 실거래", font=font_bold_lg, fill='#ffffff', anchor='mm')
-    draw.text((width//2, 210), f"{month}월 전체 거래 현황", font=font_bold_md, fill='#c084fc', anchor='mm')
-    draw.line([(200, 260), (1000, 260)], fill='#333355', width=1)
+    draw.text((width//2 + 30, geo['title_y']), spec['title'], font=fonts['bold_lg'], fill='#ffffff', anchor='mm')
+    draw.line([(200, geo['rule_y']), (width - 200, geo['rule_y'])], fill='#333355', width=1)
     
-    box_y, box_h, box_w, gap = 310, 160, 220, 35
-    start_x = (width - (box_w * 4 + gap * 3)) // 2
+    if spec['layout'] == 'single':
+        label, color, bg = _thumb_category(spec['category'])
+        x, box_y, box_w, box_h = geo['boxes'][0]
+        draw.rounded_rectangle([x, box_y, x+box_w, box_y+box_h], radius=24, fill=bg, outline=color, width=3)
+        draw.text((x + box_w//2, box_y + geo['label_dy']), f"{label} 거래건수", font=fonts['label_lg'], fill='#aaaaaa', anchor='mm')
+    else:
+        for (x, box_y, box_w, box_h), (label, color, bg) in zip(geo['boxes'], map(_thumb_category, spec['types'])):
+            draw.rounded_rectangle([x, box_y, x+box_w, box_y+box_h], radius=16, fill=bg, outline=color, width=2)
+            draw.text((x + box_w//2, box_y + geo['label_dy']), label, font=fonts['label'], fill='#aaaaaa', anchor='mm')
     
-    categories = [
-        ("아파트", apt_count, "#c084fc", "#3d2066"),
-        ("연립/다세대", villa_count, "#60a5fa", "#1e3a5f"),
-        ("단독/다가구", house_count, "#4ade80", "#14532d"),
-        ("토지", land_count, "#fbbf24", "#713f12"),
-    ]
+    brand_y, url_y = geo['brand_y']
+    draw.text((width//2, brand_y), "여주소식", font=fonts['bold_md'], fill='#555555', anchor='mm')
+    draw.text((width//2, url_y), "yjgood.kr", font=fonts['label'], fill='#444444', anchor='mm')
+    return img
+
+
+def _thumbnail_background(spec: Dict, fonts: Dict):
+    """배경 레이어 캐시 - 메모리에 없으면 템플릿 버전별 PNG 캐시, 그것도 없으면 새로 그림"""
+    from PIL import Image
+    
+    width, height = spec['size']
+    key = (THUMB_TEMPLATE_VERSION, spec['layout'], width, height, spec['title'], spec.get('category'),
+           tuple(spec.get('types', ())))
+    with _thumb_lock:
+        background = _thumb_backgrounds.get(key)
+        if background is None:
+            digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:12]
+            cache_path = os.path.join(CACHE_DIR, f"thumb_bg_v{THUMB_TEMPLATE_VERSION}_{width}x{height}_{digest}.png")
+            try:
+                background = Image.open(cache_path).convert('RGB')
+            except OSError:
+                background = _render_thumbnail_background(spec, fonts)
+                # 여러 렌더링 프로세스가 같은 캐시를 동시에 쓸 수 있어서 임시 파일에 쓴 뒤 교체 (반쯤 쓴 파일을 읽지 않도록)
+                tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+                try:
+                    os.makedirs(CACHE_DIR, exist_ok=True)
+                    background.save(tmp_path, 'PNG')
+                    os.replace(tmp_path, cache_path)
+                except OSError:
+                    with contextlib.suppress(OSError):
+                        os.remove(tmp_path)
+            _thumb_backgrounds[key] = background
+    return background.copy()
+
+
+def save_image(img, base_path: str, formats: Iterable[str] = THUMB_FORMATS) -> List[str]:
+    """업로드용 최적화 인코딩 - PNG는 256색 팔레트 + optimize, WebP는 손실 압축"""
+    from PIL import Image
+    
+    if os.path.dirname(base_path):
+        os.makedirs(os.path.dirname(base_path), exist_ok=True)
+    paths = []
+    for fmt in formats:
+        path = f"{base_path}.{fmt}"
+        if fmt == 'png':
+            img.quantize(colors=256, method=Image.Quantize.MEDIANCUT).save(path, 'PNG', optimize=True)
+        elif fmt == 'webp':
+            img.save(path, 'WEBP', quality=90, method=6)
+        else:
+            img.save(path)
+        paths.append(path)
+    return paths
+
+
+def render_thumbnail(spec: Dict) -> List[str]:
+    """변형 하나를 그려서 저장 (프로세스 풀 작업 단위)
+
+    spec: size, layout, title, month, output(확장자 제외 경로), formats와
+          row/grid는 types(유형 키, 최대 4개)/counts, single은 category(유형 키)/count/avg
+    """
+    from PIL import ImageDraw
+    
+    fonts = _thumbnail_fonts()
+    width, height = spec['size']
+    geo = _thumb_geometry(spec['layout'], width, height, len(spec.get('types', ())))
+    img = _thumbnail_background(spec, fonts)
+    draw = ImageDraw.Draw(img)
+    
+    # 배경 위에는 바뀌는 월/건수만 그림
+    draw.text((width//2, geo['month_y']), f"{spec['month']}월 전체 거래 현황", font=fonts['bold_md'], fill='#c084fc', anchor='mm')
+    
+    if spec['layout'] == 'single':
+        _, color, _ = _thumb_category(spec['category'])
+        x, box_y, box_w, _ = geo['boxes'][0]
+        draw.text((x + box_w//2, box_y + geo['count_dy']), f"{spec['count']}건", font=fonts['count_lg'], fill=color, anchor='mm')
+        draw.text((x + box_w//2, box_y + geo['avg_dy']), f"평균 {spec['avg']}", font=fonts['label_lg'], fill='#dddddd', anchor='mm')
+    else:
+        for (x, box_y, box_w, _), ptype, count in zip(geo['boxes'], spec['types'], spec['counts']):
+            _, color, _ = _thumb_category(ptype)
+            draw.text((x + box_w//2, box_y + geo['count_dy']), f"{count}건", font=fonts['count'], fill=color, anchor='mm')
+    
+    return save_image(img, spec['output'], spec.get('formats', THUMB_FORMATS))
+
+
+def render_thumbnails(specs: List[Dict], max_workers: int = None) -> List[str]:
+    """변형 여러 장을 CPU 코어 수만큼 병렬로 렌더링"""
+    try:
+        import PIL  # noqa: F401
+        _thumbnail_fonts()
+    except ImportError:
+        print("  Pillow 없음 - 섬네일 생략")
+        return []
+    except OSError:
+        print("  폰트 없음 - 섬네일 생략")
+        return []
     
-    for i, (label, count, color, bg) in enumerate(categories):
-        x = start_x + i * (box_w + gap)
-        draw.rounded_rectangle([x, box_y, x+box_w, box_y+box_h], radius=16, fill=bg, outline=color, width=2)
-        draw.text((x + box_w//2, box_y + 45), label, font=font_label, fill='#aaaaaa', anchor='mm')
-        draw.text((x + box_w//2, box_y + 105), f"{count}건", font=font_count, fill=color, anchor='mm')
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(specs)))
+    if workers == 1:
+        results = [render_thumbnail(spec) for spec in specs]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(render_thumbnail, specs))
+    paths = [path for result in results for path in result]
+    print(f"  ✅ 섬네일 {len(specs)}종 ({len(paths)}개 파일)")
+    return paths
+
+
+def thumbnail_specs(region_counts: Dict[str, Dict[str, int]], type_avgs: Dict[str, str], month: int,
+                    region: str = YEOJU_CODE, out_dir: str = THUMB_DIR) -> List[Dict]:
+    """THUMB_VARIANTS를 실제 렌더링 작업 목록으로 펼침 (og는 기존 thumbnail.png 위치)"""
+    ptypes = thumb_types()
+    if not ptypes:
+        return []
+    label = region_name(region)
+    counts = [region_counts.get(region, {}).get(ptype, 0) for ptype in ptypes]
+    specs = []
+    for variant in THUMB_VARIANTS:
+        base = {'size': variant['size'], 'layout': variant['layout'], 'month': month, 'types': ptypes}
+        per = variant.get('per')
+        if per == 'type':
+            for i, ptype in enumerate(ptypes):
+                specs.append({**base, 'title': f"{label} {TYPE_LABELS[ptype]} 실거래", 'category': ptype,
+                              'count': counts[i], 'avg': type_avgs.get(ptype, '-'),
+                              'output': os.path.join(out_dir, f"{variant['name']}-{ptype}")})
+        elif per == 'region':
+            for code, by_type in region_counts.items():
+                specs.append({**base, 'title': f"{region_name(code)} 부동산 실거래",
+                              'counts': [by_type.get(ptype, 0) for ptype in ptypes],
+                              'output': os.path.join(out_dir, f"{variant['name']}-{code}")})
+        else:
+            output = 'thumbnail' if variant['name'] == 'og' else os.path.join(out_dir, variant['name'])
+            specs.append({**base, 'title': f"{label} 부동산 실거래", 'counts': counts, 'output': output})
+    return specs
+
+
+def create_thumbnail(apt_count, villa_count, house_count, land_count, output_path="thumbnail.png"):
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("  Pillow 없음 - 섬네일 생략")
+        return None
     
-    draw.text((width//2, 550), "여주소식", font=font_bold_md, fill='#555555', anchor='mm')
-    draw.text((width//2, 595), "yjgood.kr", font=font_label, fill='#444444', anchor='mm')
+    # 폰트
+    try:
+        _thumbnail_fonts()
+    except OSError:
+        print("  폰트 없음 - 섬네일 생략")
+        return None
     
-    img.save(output_path, 'PNG', quality=95)
+    base, ext = os.path.splitext(output_path)
+    spec = {'size': (1200, 630), 'layout': 'row', 'title': f"{region_name()} 부동산 실거래", 'month': datetime.now().month,
+            'types': THUMB_DEFAULT_TYPES, 'counts': [apt_count, villa_count, house_count, land_count],
+            'output': base, 'formats': (ext.lstrip('.').lower() or 'png',)}
+    render_thumbnail(spec)
     print(f"  ✅ 섬네일: {output_path}")
     return output_path
 
 
 # ============ 워드프레스 발행 ============
-def upload_media(file_path: str) -> str:
-    """워드프레스에 이미지 업로드"""
-    if not all([WP_URL, WP_USER, WP_APP_PASSWORD]):
-        return None
-    
+def trade_digest(data: Dict[str, List[Trade]]) -> str:
+    """발행 대상 거래 데이터의 내용 해시 (순서와 무관하게 같은 거래 집합이면 같은 값)"""
+    normalized = {
+        ptype: sorted((t.name, t.dong, t.jibun, t.deal_date.isoformat() if t.deal_date else '', t.amount,
+                       t.area, t.floor, t.build_year, t.deal_type) + ((t.monthly_rent,) if t.monthly_rent else ())
+                      for t in trades)
+        for ptype, trades in sorted(data.items())
+    }
+    return hashlib.sha256(json.dumps(normalized, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_publish_state(path: str = PUBLISH_STATE_PATH) -> Dict:
+    """지난 발행 기록: 데이터 해시, 기간별 글 ID, 파일 해시별 업로드된 미디어"""
     try:
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    state.setdefault('digest', None)
+    state.setdefault('posts', {})
+    state.setdefault('media', {})
+    return state
+
+
+def save_publish_state(state: Dict, path: str = PUBLISH_STATE_PATH):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+class WordPressClient:
+    """워드프레스 REST 클라이언트 - 세션 재사용, 일시적 오류 재시도(지수 백오프 + 지터), 중복 발행 방지
+
+    재시도 전에는 slug로 이미 만들어진 글/미디어가 있는지 먼저 확인해서, 응답만 못 받은 요청이
+    두 번 생성되지 않게 한다.
+    """
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, url: str = None, user: str = None, password: str = None,
+                 retries: int = None, backoff: float = None, timeout: int = 30):
+        self.url = (WP_URL if url is None else url).rstrip('/')
+        self.auth = (WP_USER if user is None else user, WP_APP_PASSWORD if password is None else password)
+        self.retries = WP_RETRIES if retries is None else retries
+        self.backoff = WP_BACKOFF if backoff is None else backoff
+        self.timeout = timeout
+        self.session = new_session(pool_connections=1, pool_maxsize=max(WP_CONCURRENCY, 1))
+        self.lock = threading.Lock()
+
+    @property
+    def configured(self) -> bool:
+        return all([self.url, self.auth[0], self.auth[1]])
+
+    def _request(self, method: str, path: str, before_retry: Callable[[], Optional[Dict]] = None, **kwargs) -> Dict:
+        """요청 + 재시도. before_retry가 결과를 찾아내면 재시도 없이 그 결과를 반환"""
+        import requests
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1) + random.uniform(0, self.backoff))
+                if before_retry:
+                    found = before_retry()
+                    if found:
+                        return found
+            try:
+                response = self.session.request(method, f"{self.url}/wp-json/wp/v2{path}", auth=self.auth,
+                                                timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                continue
+            if response.status_code in self.RETRY_STATUS and attempt < self.retries:
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    def _find(self, kind: str, slug: str) -> Optional[Dict]:
+        import requests
+        try:
+            params = {'slug': slug, 'context': 'edit'}
+            if kind == 'posts':
+                params['status'] = 'any'
+            found = self._request('GET', f"/{kind}", params=params)
+        except requests.RequestException:
+            return None
+        return found[0] if found else None
+
+    def upload_media(self, file_path: str, state: Dict = None) -> Tuple[Optional[int], Optional[str]]:
+        """이미지 업로드 - 내용 해시로 파일명을 정해서 같은 파일은 state 캐시나 slug 조회로 재사용"""
+        digest = file_digest(file_path)
+        if state is not None:
+            with self.lock:
+                cached = state['media'].get(digest)
+            if cached:
+                return cached['id'], cached['url']
+        
+        stem, ext = os.path.splitext(os.path.basename(file_path))
+        slug = f"{stem}-{digest[:12]}".lower()
         with open(file_path, 'rb') as f:
             file_data = f.read()
         
-        filename = os.path.basename(file_path)
-        response = requests.post(
-            f"{WP_URL}/wp-json/wp/v2/media",
+        result = self._request(
+            'POST', '/media',
+            before_retry=lambda: self._find('media', slug),
             headers={
-                'Content-Disposition': f'attachment; filename="{filename}"',
-                'Content-Type': 'image/png'
+                'Content-Disposition': f'attachment; filename="{slug}{ext}"',
+                'Content-Type': mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
             },
             data=file_data,
-            auth=(WP_USER, WP_APP_PASSWORD),
-            timeout=30
         )
-        response.raise_for_status()
-        result = response.json()
-        return result.get('id'), result.get('source_url')
-    except Exception as e:
-        print(f"  미디어 업로드 실패: {e}")
-        return None, None
+        media_id, media_url = result.get('id'), result.get('source_url')
+        if state is not None and media_id:
+            with self.lock:
+                state['media'][digest] = {'id': media_id, 'url': media_url}
+        return media_id, media_url
+
+    def save_post(self, post_data: Dict, post_id: int = None) -> Dict:
+        """글 생성/수정 - slug가 같은 글이 이미 있으면 새로 만들지 않고 그 글을 수정"""
+        import requests
+        slug = post_data.get('slug')
+        if not post_id and slug:
+            existing = self._find('posts', slug)
+            if existing:
+                post_id = existing['id']
+        
+        if post_id:
+            try:
+                return self._request('POST', f"/posts/{post_id}", json=post_data)
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != 404:
+                    raise
+                # 수정할 글이 지워졌으면 새 글로 발행
+        
+        return self._request('POST', '/posts', json=post_data,
+                             before_retry=(lambda: self._find('posts', slug)) if slug else None)
+
+    def publish_many(self, jobs: List[Dict], state: Dict = None, max_workers: int = WP_CONCURRENCY) -> List[Optional[Dict]]:
+        """여러 글을 파이프라인으로 발행 - 미디어 업로드를 동시에 시작하고, 끝나는 글부터 바로 글 발행
+
+        job: post(글 데이터), thumbnail(이미지 경로, 선택), post_id(수정할 글, 선택)
+        """
+        results = [None] * len(jobs)
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            post_futures = {}
+            
+            def submit_post(i: int, media_id: Optional[int]):
+                post_data = dict(jobs[i]['post'])
+                if media_id:
+                    post_data['featured_media'] = media_id
+                post_futures[executor.submit(self.save_post, post_data, jobs[i].get('post_id'))] = i
+            
+            media_futures = {}
+            for i, job in enumerate(jobs):
+                if job.get('thumbnail') and os.path.exists(job['thumbnail']):
+                    media_futures[executor.submit(self.upload_media, job['thumbnail'], state)] = i
+                else:
+                    submit_post(i, None)
+            
+            for future in as_completed(media_futures):
+                i = media_futures[future]
+                try:
+                    media_id, media_url = future.result()
+                    print(f"  ✅ 섬네일: {media_url}")
+                except Exception as e:
+                    print(f"  미디어 업로드 실패: {e}")
+                    _metrics.error('publish', jobs[i]['thumbnail'], e)
+                    media_id = None
+                submit_post(i, media_id)
+            
+            for future in as_completed(post_futures):
+                i = post_futures[future]
+                try:
+                    results[i] = future.result()
+                    print(f"  ✅ 발행: {results[i].get('link', '')}")
+                except Exception as e:
+                    print(f"  발행 실패: {e}")
+                    _metrics.error('publish', jobs[i]['post'].get('slug') or jobs[i]['post'].get('title', ''), e)
+        return results
+
+
+_wp_client = None
 
 
-def post_to_wordpress(title: str, content: str, category_id: int = None, thumbnail_id: int = None) -> bool:
-    if not all([WP_URL, WP_USER, WP_APP_PASSWORD]):
+def get_wp_client() -> WordPressClient:
+    global _wp_client
+    with _session_lock:
+        if _wp_client is None:
+            _wp_client = WordPressClient()
+    return _wp_client
+
+
+def post_to_wordpress(title: str, content: str, category_id: int = None, thumbnail_id: int = None,
+                      post_id: int = None, slug: str = None) -> Optional[int]:
+    """글 발행 (post_id가 있으면 기존 글 수정) - 성공하면 글 ID 반환"""
+    client = get_wp_client()
+    if not client.configured:
         with open("realestate_output.html", 'w', encoding='utf-8') as f:
             f.write(content)
         print("  ✅ HTML 파일 저장: realestate_output.html")
-        return False
+        return None
     
+    post_data = build_post_data(title, content, category_id, thumbnail_id, slug)
+    try:
+        result = client.save_post(post_data, post_id)
+        print(f"  ✅ {'수정' if post_id else '발행'}: {result.get('link', '')}")
+        return result.get('id')
+    except Exception as e:
+        print(f"  발행 실패: {e}")
+        return None
+
+
+def build_post_data(title: str, content: str, category_id: int = None, thumbnail_id: int = None,
+                    slug: str = None) -> Dict:
     post_data = {
         'title': title,
         'content': content,
@@ -675,59 +3111,366 @@ def post_to_wordpress(title: str, content: str, category_id: int = None, thumbna
         post_data['categories'] = [category_id]
     if thumbnail_id:
         post_data['featured_media'] = thumbnail_id
-    
+    if slug:
+        post_data['slug'] = slug
+    return post_data
+
+
+# ============ 상주 모드 ============
+def probe_month(property_type: str, deal_ymd: str, lawd_cd: str = YEOJU_CODE) -> Optional[str]:
+    """첫 페이지를 1건만 받아 본문(totalCount 포함) 해시 - 거래가 추가/해제되면 달라짐, 조회 실패는 None"""
+    url = API_URLS.get(property_type)
+    if not url:
+        return None
     try:
-        response = requests.post(
-            f"{WP_URL}/wp-json/wp/v2/posts",
-            json=post_data,
-            auth=(WP_USER, WP_APP_PASSWORD),
-            timeout=30
-        )
-        response.raise_for_status()
-        result = response.json()
-        print(f"  ✅ 발행: {result.get('link', '')}")
-        return True
+        content = _fetch_page(url, deal_ymd, 1, lawd_cd, num_rows=1)
+    except QuotaExceeded:
+        raise
     except Exception as e:
-        print(f"  발행 실패: {e}")
-        return False
+        print(f"  API Error ({property_type} {deal_ymd} 확인): {_redact(str(e))}")
+        _metrics.error('probe', f"{lawd_cd} {property_type} {deal_ymd}", e)
+        return None
+    return hashlib.blake2b(content, digest_size=8).hexdigest()
+
+
+def watch(args: argparse.Namespace, interval: int = WATCH_INTERVAL, refresh: int = WATCH_REFRESH, max_polls: int = 0):
+    """종료하지 않고 interval초마다 페이지 지역의 이번 달/지난 달을 유형별 1건짜리 요청으로 확인
+
+    확인 결과(probe_month 해시)가 지난번과 다를 때만 run()으로 동기화·생성·발행한다. 건수가 그대로인 정정은
+    확인에 안 잡힐 수 있어서 refresh초가 지나면 결과와 관계없이 한 번 돌린다. HTTP 세션, 섬네일 폰트/배경,
+    저장소 연결은 프로세스에 남아 매번 새로 만들지 않는다. 확인 자체가 실패한 유형은 바뀌지 않은 것으로 본다.
+    """
+    global _metrics
+    if not MOLIT_API_KEY:
+        print("  API 키 없음 - 상주 모드 종료")
+        return
+    region = REGION_CODES[0] if REGION_CODES else YEOJU_CODE
+    conn = open_store()
+    seen = {}
+    last_run = None
+    polls = 0
+    print(f"👀 상주 모드: {interval}초마다 확인 (전체 갱신 최대 간격 {refresh}초, Ctrl+C로 종료)")
+    try:
+        while True:
+            started = time.monotonic()
+            now = datetime.now()
+            current = now.strftime('%Y%m')
+            last = (now.replace(day=1) - timedelta(days=1)).strftime('%Y%m')
+            jobs = [(region, ptype, ym) for ptype in ENABLED_TYPES for ym in (current, last)]
+            try:
+                probes = schedule_fetch(jobs, fetch=probe_month, pending_path=None)
+            except Exception as e:
+                print(f"  ⚠️ 확인 실패: {_redact(str(e))}")
+                probes = {}
+            changed = [job for job in jobs if probes.get(job) is not None and probes[job] != seen.get(job)]
+            due = last_run is None or started - last_run >= refresh
+            
+            if changed or due:
+                reason = ', '.join(f"{TYPE_LABELS[p]} {ym}" for _, p, ym in changed[:4]) if changed else '정기 갱신'
+                print(f"[{now:%H:%M:%S}] 🔄 변경 감지: {reason}" + (f" 외 {len(changed) - 4}개" if len(changed) > 4 else ''))
+                # 실행마다 계측을 새로 시작 (metrics.json은 마지막 실행 결과), 달이 바뀌어도 이번 달/지난 달 기준
+                _metrics = Metrics()
+                args.months = [current, last]
+                try:
+                    run(args, conn)
+                except Exception as e:
+                    _metrics.info['outcome'] = 'failed'
+                    _metrics.error('watch', type(e).__name__, e)
+                    print(f"  ❌ 실행 실패: {_redact(str(e))} - 다음 확인 때 다시 시도")
+                else:
+                    seen.update((job, digest) for job, digest in probes.items() if digest is not None)
+                    last_run = started
+                finally:
+                    _metrics.write(METRICS_PATH)
+            else:
+                print(f"[{now:%H:%M:%S}] 변경 없음 (확인 {len(jobs)}건, 남은 호출 {get_quota().remaining}건)")
+            
+            polls += 1
+            if max_polls and polls >= max_polls:
+                break
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        print("👋 상주 모드 종료")
+    finally:
+        conn.close()
 
 
 # ============ 메인 ============
-def main():
-    print("🏠 여주 부동산 실거래가 업데이트 시작...")
+# 하위 명령 없이 실행하면 네 단계를 모두 돌림 (--sync-only는 fetch만, --offline은 fetch 빼고)
+PIPELINE_STEPS = ('fetch', 'render', 'thumbnail', 'publish')
+
+# 최상위와 하위 명령에서 같이 쓰는 옵션 (이름 -> add_argument 인자)
+_OPTIONS = {
+    'region': (('--region',), dict(help='지역 코드 (쉼표 구분, 기본 REGION_CODES · 페이지/발행은 첫 지역)')),
+    'months': (('--months',), dict(help='계약년월 YYYYMM (쉼표 구분, 기본 이번 달·지난 달 · 페이지는 가장 최근 달 기준)')),
+    'types': (('--types',), dict(help='데이터셋 키 (쉼표 구분 또는 all, 기본 DATASETS)')),
+    'dry_run': (('--dry-run',), dict(action='store_true', help='API 호출·파일 쓰기·발행 없이 할 일만 출력')),
+    'export': (('--export',), dict(metavar='DIR', default=EXPORT_DIR,
+                                   help='저장소의 거래를 DIR 아래 지역/유형/월 파티션 Parquet(EXPORT_FORMAT=arrow면 Arrow IPC)로 내보내기')),
+    'full_history': (('--full-history',), dict(action='store_true', default=FULL_HISTORY,
+                                               help='페이지에 최신 거래만이 아니라 저장소의 전체 거래를 싣기')),
+    'delta_feed': (('--delta-feed',), dict(action='store_true', default=DELTA_FEED,
+                                           help='지난 실행 이후 신규 거래만 담은 data/delta.json도 생성')),
+    'force_publish': (('--force-publish',), dict(action='store_true', help='데이터가 그대로여도 워드프레스에 다시 발행')),
+    'workers': (('--workers',), dict(type=int, default=FETCH_CONCURRENCY, help='백필 동시 작업 수')),
+    'interval': (('--interval',), dict(type=int, default=WATCH_INTERVAL, help='상주 모드 확인 주기(초)')),
+    'max_polls': (('--max-polls',), dict(type=int, default=0, help='상주 모드 확인 횟수 제한 (0이면 무제한, 테스트용)')),
+}
+_SCOPE_OPTIONS = ('region', 'months', 'types', 'dry_run')
+
+# 하위 명령 -> (도움말, 추가 옵션)
+COMMANDS = {
+    'fetch': ('마감되지 않은 달만 API로 받아 저장소에 반영', ('export',)),
+    'render': ('저장소 자료로 index.html + data/ 생성 (네트워크 없음)', ('full_history', 'delta_feed')),
+    'thumbnail': ('저장소 자료로 섬네일만 생성 (네트워크 없음)', ()),
+    'publish': ('저장소 자료로 워드프레스에 발행 (지난 발행과 같으면 생략)', ('force_publish',)),
+    'stats': ('저장소의 유형·월별 건수/평균/중위/최고 출력 (네트워크 없음)', ()),
+    'backfill': ('FROM~TO 기간의 과거 거래를 저장소에 채움', ('workers', 'export')),
+    'watch': ('종료하지 않고 주기적으로 확인해 바뀌었을 때만 갱신·발행', ('interval', 'max_polls')),
+}
+
+
+def _add_options(parser: argparse.ArgumentParser, names: Iterable[str], sub: bool = False):
+    """하위 명령 쪽 기본값은 SUPPRESS - 최상위에서 준 값(과 기본값)을 덮어쓰지 않도록"""
+    for name in names:
+        flags, kwargs = _OPTIONS[name]
+        parser.add_argument(*flags, **(dict(kwargs, default=argparse.SUPPRESS) if sub else kwargs))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='여주 부동산 실거래가 업데이트 (하위 명령 없이 실행하면 수집→생성→섬네일→발행)')
+    _add_options(parser, _OPTIONS)
+    parser.add_argument('--sync-only', action='store_true', help='저장소 동기화만 하고 종료 (= fetch)')
+    parser.add_argument('--offline', action='store_true', help='API 호출 없이 저장소 데이터로만 생성/발행')
+    parser.add_argument('--backfill', nargs=2, metavar=('FROM', 'TO'), help='YYYYMM YYYYMM 기간의 과거 거래를 저장소에 채우고 종료')
+    parser.add_argument('--watch', action='store_true',
+                        help='종료하지 않고 WATCH_INTERVAL마다 이번 달/지난 달을 확인해 바뀌었을 때만 갱신·발행')
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND')
+    for name, (help_text, options) in COMMANDS.items():
+        command = commands.add_parser(name, help=help_text, description=help_text)
+        if name == 'backfill':
+            command.add_argument('backfill', nargs=2, metavar='YYYYMM', help='시작월 끝월 (FROM TO)')
+        _add_options(command, _SCOPE_OPTIONS + options, sub=True)
+    return parser
+
+
+def apply_scope(args: argparse.Namespace):
+    """--region/--types를 REGION_CODES/ENABLED_TYPES에 반영하고 args.months를 최신순 YYYYMM 목록으로 바꿈
+
+    페이지 HTML/JS도 ENABLED_TYPES를 보므로 모듈 값을 그 자리에서 고친다. 잘못된 값은 ValueError.
+    """
+    if args.region:
+        REGION_CODES[:] = list(GYEONGGI_REGIONS) if args.region == 'gyeonggi' else \
+            [code.strip() for code in args.region.split(',') if code.strip()]
+    if args.types:
+        types = list(DATASETS) if args.types == 'all' else [key.strip() for key in args.types.split(',') if key.strip()]
+        unknown = [key for key in types if key not in DATASETS]
+        if unknown:
+            raise ValueError(f"알 수 없는 데이터셋: {', '.join(unknown)} (가능: {', '.join(DATASETS)})")
+        ENABLED_TYPES[:] = types
+    if args.months:
+        months = {ym.strip() for ym in args.months.split(',') if ym.strip()}
+        bad = [ym for ym in months if not re.fullmatch(r'\d{4}(0[1-9]|1[0-2])', ym)]
+        if bad:
+            raise ValueError(f"계약년월은 YYYYMM: {', '.join(sorted(bad))}")
+        args.months = sorted(months, reverse=True)
+    else:
+        current = datetime.now().strftime('%Y%m')
+        args.months = [current, prev_month(current)]
+    if not REGION_CODES or not ENABLED_TYPES:
+        raise ValueError("지역 또는 데이터셋이 비어 있음")
+
+
+def main(argv: List[str] = None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        apply_scope(args)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    command = args.command or ('watch' if args.watch else 'backfill' if args.backfill else None)
+    if command in PIPELINE_STEPS:
+        args.steps = (command,)
+    else:
+        args.steps = ('fetch',) if args.sync_only else PIPELINE_STEPS[1:] if args.offline else PIPELINE_STEPS
+    
+    if command == 'stats':
+        # 저장소 조회만 - 계측/프로파일러도 건너뛰어 바로 끝남
+        if not os.path.exists(STORE_PATH):
+            print(f"저장소 없음: {STORE_PATH} (먼저 fetch 실행)")
+            return
+        conn = open_store()
+        try:
+            print_store_stats(conn, REGION_CODES, ENABLED_TYPES, args.months)
+        finally:
+            conn.close()
+        return
+    if command == 'watch':
+        if args.dry_run:
+            print(f"[dry-run] 상주 모드: {args.interval}초마다 {len(ENABLED_TYPES) * 2}건 확인 후 바뀌었을 때만 갱신·발행")
+            return
+        watch(args, interval=args.interval, max_polls=args.max_polls)
+        return
+    profiler = start_profiler()
+    try:
+        run(args)
+    except Exception as e:
+        _metrics.info['outcome'] = 'failed'
+        _metrics.error('main', type(e).__name__, e)
+        raise
+    finally:
+        if profiler:
+            stop_profiler(profiler)
+        if not args.dry_run:
+            print(f"  📈 계측: {_metrics.write(METRICS_PATH)}")
+            _metrics.write_summary()
+
+
+def export_stage(conn: sqlite3.Connection, out_dir: str):
+    """--export/EXPORT_DIR가 있으면 저장소를 분석용 파일로 내보냄 (동기화 직후, 페이지 생성과 무관)"""
+    if not out_dir:
+        return
+    with _metrics.stage('export'):
+        _metrics.info['exported'] = export_store(conn, out_dir)['written']
+
+
+def run(args: argparse.Namespace, conn: sqlite3.Connection = None):
+    """수집 → 페이지/데이터 파일 → 섬네일 → 발행 중 args.steps 단계만 (단계별 소요 시간은 _metrics에 기록)
+
+    fetch만 API를 부르고 나머지는 저장소에서 읽는다. requests/NumPy/Pillow는 그 단계에서 처음 불러온다.
+    args.dry_run이면 API 호출·파일 쓰기·발행 없이 단계별로 할 일만 출력한다.
+    conn을 주면 (상주 모드) 저장소를 새로 열지 않고 그 연결을 쓴다.
+    """
+    print("🏠 여주 부동산 실거래가 업데이트 시작..." + (" (dry-run)" if args.dry_run else ""))
     
-    current = datetime.now().strftime('%Y%m')
-    last = (datetime.now().replace(day=1) - timedelta(days=1)).strftime('%Y%m')
+    steps = args.steps
+    current, last = args.months[0], prev_month(args.months[0])
     
     data = {}
     counts = {}
     
-    for ptype in ['apt', 'villa', 'house', 'land']:
-        trades = fetch_trades(ptype, current)
-        if len(trades) < 3:
-            trades += fetch_trades(ptype, last)
-        
-        data[ptype] = trades
-        counts[ptype] = len(trades)
-        print(f"  {TYPE_LABELS[ptype]}: {len(trades)}건")
+    # 마감되지 않은 (지역 × 유형 × 계약년월) 조합만 호출 제한에 맞춰 동시 조회해서 저장소에 반영
+    ptypes = ENABLED_TYPES
+    region = REGION_CODES[0]
+    # dry-run은 저장소가 없어도 새로 만들지 않음 (빈 메모리 저장소 기준으로 할 일 출력)
+    conn = conn or open_store(':memory:' if args.dry_run and not os.path.exists(STORE_PATH) else STORE_PATH)
+    if args.backfill:
+        if args.dry_run:
+            units = [(lawd_cd, ptype, ym) for ym in month_range(*args.backfill)
+                     for lawd_cd in REGION_CODES for ptype in ptypes]
+            print(f"  [dry-run] 백필 {args.backfill[0]}~{args.backfill[1]}: 전체 {len(units)}개 중 "
+                  f"{len(open_months(conn, units))}개 조회 예정")
+            return
+        with _metrics.stage('backfill'):
+            _metrics.info.update(backfill(conn, args.backfill[0], args.backfill[1], ptypes, REGION_CODES,
+                                          workers=args.workers))
+        export_stage(conn, args.export)
+        return
+    stale = {}
+    if 'fetch' in steps:
+        jobs = [(lawd_cd, ptype, ymd) for lawd_cd in REGION_CODES for ptype in ptypes for ymd in args.months]
+        if args.dry_run:
+            pending = open_months(conn, jobs)
+            print(f"  [dry-run] 동기화 {len(pending)}개 조합 조회 예정 (전체 {len(jobs)}개, {len(REGION_CODES)}개 지역)")
+            for lawd_cd, ptype, ym in pending[:10]:
+                print(f"    {lawd_cd} {TYPE_LABELS[ptype]} {ym}")
+            if len(pending) > 10:
+                print(f"    ... 외 {len(pending) - 10}개")
+        else:
+            with _metrics.stage('sync'):
+                synced = sync_store(conn, jobs)
+            print(f"  저장소 동기화: {synced['synced']}개 조합 ({len(REGION_CODES)}개 지역, 남은 호출 {get_quota().remaining}건)"
+                  + (f" · 실패 {len(synced['failed'])}개" if synced['failed'] else ""))
+            stale = stale_months(conn, [job for job in synced['failed'] if job[0] == region])
+            export_stage(conn, args.export)
+    elif not args.dry_run and not args.command:
+        export_stage(conn, args.export)
+    if steps == ('fetch',):
+        return
+    
+    # 못 받은 달은 저장소의 지난 자료로 생성하되, 지난 자료조차 없으면 0건을 발행하지 않도록 중단
+    missing = sorted(f"{TYPE_LABELS[ptype]} {ym}" for (_, ptype, ym), since in stale.items() if since is None)
+    if missing:
+        _metrics.info['outcome'] = 'degraded'
+        print(f"⚠️ 수집하지 못했고 저장된 자료도 없는 달: {', '.join(missing)} - 생성/발행 중단")
+        return
+    stale_since = {}
+    for (_, ptype, ym), since in sorted(stale.items()):
+        since = since[:16].replace('T', ' ')
+        stale_since[ptype] = min(stale_since.get(ptype, since), since)
+    if stale_since:
+        _metrics.info['stale'] = [f"{ptype} ({since})" for ptype, since in stale_since.items()]
+        print(f"  ↩️ 지난 수집 자료 사용: {', '.join(f'{TYPE_LABELS[p]} {since}' for p, since in stale_since.items())}")
+    
+    window = {}
+    with _metrics.stage('load'):
+        for ptype in ptypes:
+            this_month = load_store(conn, ptype, current, region)
+            last_month = load_store(conn, ptype, last, region)
+            window[ptype] = this_month + last_month
+            trades = this_month if len(this_month) >= 3 else this_month + last_month
+            
+            data[ptype] = trades
+            counts[ptype] = len(trades)
+            _metrics.count_rows('loaded', region, ptype, current, len(this_month))
+            _metrics.count_rows('loaded', region, ptype, last, len(trades) - len(this_month))
+            print(f"  {TYPE_LABELS[ptype]}: {len(trades)}건")
     
     total = sum(counts.values())
+    _metrics.info['total'] = total
     print(f"📊 총 {total}건")
     
     if total == 0:
+        _metrics.info['outcome'] = 'no-data'
         print("거래 데이터 없음")
         return
     
-    # HTML 생성
-    html_content = generate_html(data)
+    # 지난 실행 이후 새로 본 거래 (늦게 신고된 지난 달 거래 포함) - NEW 배지와 글 제목에 사용
+    with _metrics.stage('delta'):
+        delta = compute_delta(window, (current, last))
+    new = delta['new'] if delta['previous'] else None
+    if delta['previous']:
+        _metrics.info['new'] = len(delta['new'])
+        print(f"  🆕 지난 실행 이후 신규 {len(delta['new'])}건 · 해제/정정 {delta['removed']}건")
+    
+    # HTML 셸 + 데이터 파일 저장 (GitHub Pages용)
+    if 'render' in steps and args.dry_run:
+        print(f"  [dry-run] index.html + {SITE_DATA_DIR}/ 생성 예정 ({len(ptypes)}개 유형, {total}건)")
+    elif 'render' in steps:
+        with _metrics.stage('site'):
+            history = {ptype: load_history(conn, ptype, region) for ptype in ptypes} if args.full_history else None
+            manifest = write_site(data, history=history, new=new, stale=stale_since)
+            if args.delta_feed:
+                write_delta_feed(delta)
+        chunks = sum(len(names) for names in manifest['files'].values())
+        listed = sum(manifest[ptype]['count'] for ptype in ptypes)
+        print(f"  ✅ index.html + {SITE_DATA_DIR}/ 생성 (카드 {listed}건, 청크 {chunks}개)")
     
-    # HTML 파일 저장 (GitHub Pages용)
-    with open("index.html", 'w', encoding='utf-8') as f:
-        f.write(html_content)
-    print("  ✅ index.html 생성")
+    # 섬네일 생성 (OG/정사각형/유형별/지역별 변형을 병렬 렌더링)
+    # publish 단독 실행이면 디스크의 섬네일을 그대로 올리고, 이번에 그렸다면 실제로 만들어진 경우에만 올림
+    thumb_path = f"thumbnail.{THUMB_UPLOAD_FORMAT}"
+    if 'thumbnail' in steps:
+        region_counts = {code: {ptype: len(load_store(conn, ptype, current, code)) for ptype in ptypes}
+                         for code in REGION_CODES}
+        region_counts[region] = counts
+        type_avgs = {ptype: _short_or_dash(compute_stats(data[ptype]).get('avg')) for ptype in ptypes}
+        specs = thumbnail_specs(region_counts, type_avgs, int(current[4:]), region)
+        if args.dry_run:
+            print(f"  [dry-run] 섬네일 {len(specs)}종 생성 예정")
+        else:
+            with _metrics.stage('thumbnail'):
+                rendered = render_thumbnails(specs)
+            if thumb_path not in rendered:
+                thumb_path = None
     
-    # 섬네일 생성
-    thumb_path = create_thumbnail(counts['apt'], counts['villa'], counts['house'], counts['land'], "thumbnail.png")
+    # 이번에 본 거래 지문은 발행까지 끝난 뒤에 저장 - 발행 실패/중단 시 다음 실행에서도 같은 거래가 신규로 잡히도록
+    save_seen = 'render' in steps and not args.dry_run
+    if 'publish' not in steps:
+        if save_seen:
+            save_fingerprints(delta['fingerprints'])
+        print("✅ 완료!")
+        return
     
     # 워드프레스 발행
     now = datetime.now()
@@ -735,7 +3478,9 @@ def main():
     week_names = ['첫째', '둘째', '셋째', '넷째', '다섯째']
     week_str = week_names[min(week-1, 4)]
     
-    title = f"{now.month}월 {week_str}주 여주시 부동산 실거래가 ({total}건)"
+    # 신규 건수는 이번 실행에서 페이지를 만들 때만 의미가 있음 (publish 단독이면 render가 이미 지문을 갱신)
+    count_label = f"신규 {len(delta['new'])}건" if delta['previous'] and 'render' in steps else f"{total}건"
+    title = f"{now.month}월 {week_str}주 {region_name(region)} 부동산 실거래가 ({count_label})"
     
     # iframe으로 GitHub Pages 삽입
     iframe_content = f'''
@@ -744,14 +3489,47 @@ def main():
 <p style="font-size:12px; color:#666; margin-top:16px;">※ {now.month}월 {week_str}주 기준 업데이트 · 거래건수는 {now.month}월 전체 누적<br>자료 출처: 국토교통부 실거래가 공개시스템</p>
 '''
     
-    # 섬네일 업로드
-    thumb_id = None
-    if thumb_path and os.path.exists(thumb_path):
-        thumb_id, thumb_url = upload_media(thumb_path)
-        if thumb_id:
-            print(f"  ✅ 섬네일 업로드: {thumb_url}")
+    # 지난 발행과 거래 데이터가 같으면 업로드/발행 생략, 같은 주차 글이 있으면 새로 만들지 않고 수정
+    state = load_publish_state()
+    digest = trade_digest(data)
+    if digest == state['digest'] and not args.force_publish:
+        _metrics.info['outcome'] = 'unchanged'
+        if save_seen:
+            save_fingerprints(delta['fingerprints'])
+        print("  변경 없음 - 워드프레스 발행 생략")
+        print("✅ 완료!")
+        return
+    
+    period_key = f"{now.year}-{now.month:02d}-w{week}"
+    if args.dry_run:
+        action = f"글 {state['posts'][period_key]} 수정" if period_key in state['posts'] else "새 글 작성"
+        print(f"  [dry-run] 워드프레스 발행 예정: {title} ({action})")
+        return
+    client = get_wp_client()
+    if not client.configured:
+        _metrics.info['outcome'] = 'saved-html'
+        post_to_wordpress(title, iframe_content, category_id=137)
+        if save_seen:
+            save_fingerprints(delta['fingerprints'])
+        print("✅ 완료!")
+        return
     
-    post_to_wordpress(title, iframe_content, category_id=137, thumbnail_id=thumb_id)
+    # 섬네일 업로드(같은 파일이 이미 올라가 있으면 재사용)와 발행을 파이프라인으로 처리.
+    # 주차별 고정 slug로 재시도/캐시 유실 시에도 같은 글을 다시 만들지 않음
+    job = {
+        'post': build_post_data(title, iframe_content, category_id=137, slug=f"realestate-{region}-{period_key}"),
+        'thumbnail': thumb_path,
+        'post_id': state['posts'].get(period_key),
+    }
+    with _metrics.stage('publish'):
+        result, = client.publish_many([job], state)
+    _metrics.info['outcome'] = 'published' if result and result.get('id') else 'publish-failed'
+    if result and result.get('id'):
+        state['digest'] = digest
+        state['posts'][period_key] = result['id']
+        if save_seen:
+            save_fingerprints(delta['fingerprints'])
+    save_publish_state(state)
     
     print("✅ 완료!")
 
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+국토교통부 실거래가 API / 워드프레스 REST API 로컬 대역 서버 (표준 라이브러리만 사용)
+- 유형별 거래 수, 페이지 나눔, 오류 코드, 지연을 설정할 수 있는 MOLIT 형식 XML 응답
+- 워드프레스 미디어 업로드 / 글 생성·수정 / slug 조회
+- /__stats 로 요청 수와 주입한 오류 수 확인
+- /__rows?apt=130 처럼 실행 중에 유형별 거래 수를 바꿔 신규 거래 발생을 흉내 냄
+
+사용 예:
+    python stub_server.py --port 8765 --rows apt=300,villa=80,house=20,land=50 --latency 0.2
+    MOLIT_BASE_URL=http://127.0.0.1:8765 MOLIT_API_KEY=dummy \\
+    WP_URL=http://127.0.0.1:8765 WP_USER=dummy WP_APP_PASSWORD=dummy python fetch_realestate.py
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 서비스 이름 -> 유형 (fetch_realestate.API_URLS 경로와 같음)
+SERVICES = {
+    'RTMSDataSvcAptTrade': 'apt',
+    'RTMSDataSvcRHTrade': 'villa',
+    'RTMSDataSvcSHTrade': 'house',
+    'RTMSDataSvcLandTrade': 'land',
+    'RTMSDataSvcOffiTrade': 'offi',
+    'RTMSDataSvcSilvTrade': 'presale',
+    'RTMSDataSvcAptRent': 'apt_rent',
+    'RTMSDataSvcRHRent': 'villa_rent',
+    'RTMSDataSvcSHRent': 'house_rent',
+    'RTMSDataSvcOffiRent': 'offi_rent',
+}
+# 유형 -> 단지명 태그 (전월세는 매매 유형과 같은 태그)
+NAME_TAGS = {'apt': 'aptNm', 'villa': 'mhouseNm', 'house': 'houseNm', 'offi': 'offiNm', 'presale': 'aptNm'}
+
+DONGS = ['상동', '교동', '하동', '오학동', '현암동', '가남읍 태평리']
+NAMES = ['여주자이', '현대홈타운', '세종파크빌', 'e편한세상 여주', '신안실크밸리', '부영사랑으로']
+
+
+def trade_xml(ptype: str, lawd_cd: str, deal_ymd: str, i: int, cancel_rate: float) -> str:
+    """(유형, 지역, 계약년월, 순번)이 같으면 항상 같은 거래"""
+    rng = random.Random(f"{ptype}:{lawd_cd}:{deal_ymd}:{i}")
+    year, month = deal_ymd[:4], int(deal_ymd[4:])
+    dong = rng.choice(DONGS)
+    fields = {
+        'umdNm': dong,
+        'jibun': str(rng.randint(1, 999)),
+        'dealYear': year,
+        'dealMonth': str(month),
+        'dealDay': str(rng.randint(1, 28)),
+        'dealingGbn': rng.choice(['중개거래', '중개거래', '직거래']),
+    }
+    if ptype == 'land':
+        fields.update(dealAmount=f"{rng.randint(500, 30000):,}", dealArea=f"{rng.uniform(100, 3000):.1f}")
+    else:
+        base = ptype.replace('_rent', '')
+        fields.update({
+            NAME_TAGS[base]: rng.choice(NAMES) if base != 'house' else '',
+            'dealAmount': f"{rng.randint(5000, 90000):,}",
+            'buildYear': str(rng.randint(1990, 2024)),
+            'excluUseAr' if base != 'house' else 'totFlrAr': f"{rng.choice([39.9, 59.9, 84.9, 101.5, 134.8]):.2f}",
+            'floor': str(rng.randint(1, 25)) if base != 'house' else '',
+        })
+        if base != ptype:
+            # 전월세: 거래금액 대신 보증금/월세(전세는 0), 거래유형 대신 계약구분
+            del fields['dealAmount'], fields['dealingGbn']
+            fields.update(deposit=f"{rng.randint(500, 50000):,}",
+                          monthlyRent=str(rng.choice([0, 0, 30, 50, 70, 120])),
+                          contractType=rng.choice(['신규', '갱신', '']))
+    if rng.random() < cancel_rate:
+        fields['cdealType'] = 'O'
+    return '<item>' + ''.join(f"<{tag}>{value}</{tag}>" for tag, value in fields.items()) + '</item>'
+
+
+def molit_xml(result_code: str, items: str = '', page: int = 1, size: int = 0, total: int = 0) -> bytes:
+    message = 'NORMAL SERVICE.' if result_code in ('00', '000') else 'STUB ERROR'
+    return (f"<?xml version='1.0' encoding='UTF-8'?><response><header><resultCode>{result_code}</resultCode>"
+            f"<resultMsg>{message}</resultMsg></header><body><items>{items}</items><numOfRows>{size}</numOfRows>"
+            f"<pageNo>{page}</pageNo><totalCount>{total}</totalCount></body></response>").encode('utf-8')
+
+
+class StubState:
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.rng = random.Random(args.seed)
+        self.objects = {'posts': {}, 'media': {}}
+        self.next_id = 1000
+
+    def roll(self, rate: float) -> bool:
+        with self.lock:
+            return self.rng.random() < rate
+
+    def count(self, name: str):
+        with self.lock:
+            self.stats[name] += 1
+
+
+class Handler(BaseHTTPRequestHandler):
+    state: StubState = None
+
+    def log_message(self, *args):
+        if self.state.args.verbose:
+            super().log_message(*args)
+
+    def _send(self, status: int, body: bytes = b'', content_type: str = 'application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, obj):
+        self._send(status, json.dumps(obj, ensure_ascii=False).encode('utf-8'))
+
+    def _delay(self):
+        latency = self.state.args.latency
+        if latency:
+            time.sleep(latency * random.uniform(0.5, 1.5))
+
+    # ---- 국토교통부 ----
+    def _molit(self, ptype: str, query: dict):
+        args = self.state.args
+        self.state.count(f"molit.{ptype}")
+        self._delay()
+        if self.state.roll(args.http_error_rate):
+            self.state.count('molit.http_error')
+            return self._send(503, b'Service Unavailable', 'text/plain')
+        if self.state.roll(args.error_rate):
+            self.state.count(f"molit.result_{args.error_code}")
+            return self._send(200, molit_xml(args.error_code), 'application/xml')
+
+        lawd_cd = query.get('LAWD_CD', [''])[0]
+        deal_ymd = query.get('DEAL_YMD', [''])[0]
+        if not re.fullmatch(r'\d{6}', deal_ymd):
+            return self._send(200, molit_xml('10'), 'application/xml')
+        page = int(query.get('pageNo', ['1'])[0])
+        size = int(query.get('numOfRows', ['10'])[0])
+        total = args.rows.get(ptype, 0)
+        items = ''.join(trade_xml(ptype, lawd_cd, deal_ymd, i, args.cancel_rate)
+                        for i in range((page - 1) * size, min(total, page * size)))
+        self._send(200, molit_xml('000', items, page, size, total), 'application/xml')
+
+    # ---- 워드프레스 ----
+    def _wp(self, method: str, kind: str, object_id: str, query: dict, body: bytes):
+        args = self.state.args
+        self.state.count(f"wp.{method}.{kind}")
+        self._delay()
+        objects = self.state.objects[kind]
+        if method == 'GET':
+            slug = query.get('slug', [''])[0]
+            return self._json(200, [obj for obj in objects.values() if obj['slug'] == slug])
+
+        if self.state.roll(args.wp_fail_rate):
+            self.state.count('wp.http_error')
+            return self._send(502, b'{"code":"stub_error"}')
+        if object_id:
+            obj = objects.get(int(object_id))
+            if obj is None:
+                return self._json(404, {'code': 'rest_post_invalid_id'})
+            obj.update(json.loads(body or b'{}'))
+            return self._json(200, obj)
+
+        with self.state.lock:
+            self.state.next_id += 1
+            new_id = self.state.next_id
+        if kind == 'media':
+            match = re.search(r'filename="([^"]+)"', self.headers.get('Content-Disposition', ''))
+            filename = match.group(1) if match else f"upload-{new_id}"
+            slug = filename.rsplit('.', 1)[0]
+            obj = {'id': new_id, 'slug': slug, 'source_url': f"http://{self.headers['Host']}/uploads/{filename}",
+                   'bytes': len(body)}
+        else:
+            data = json.loads(body or b'{}')
+            obj = dict(data, id=new_id, slug=data.get('slug') or f"post-{new_id}",
+                       link=f"http://{self.headers['Host']}/?p={new_id}")
+        objects[new_id] = obj
+        self._json(201, obj)
+
+    def _route(self, method: str):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0)) if method == 'POST' else b''
+        if url.path == '/__stats':
+            return self._json(200, dict(self.state.stats))
+        if url.path == '/__rows':
+            # 실행 중에 유형별 거래 수 바꾸기 (예: /__rows?apt=130) - 상주 모드 변경 감지 확인용
+            with self.state.lock:
+                self.state.args.rows.update({ptype: int(values[0]) for ptype, values in query.items()})
+                return self._json(200, self.state.args.rows)
+
+        wp = re.fullmatch(r'/wp-json/wp/v2/(posts|media)(?:/(\d+))?', url.path)
+        if wp:
+            return self._wp(method, wp.group(1), wp.group(2), query, body)
+        service = url.path.strip('/').split('/')[0]
+        if method == 'GET' and service in SERVICES:
+            return self._molit(SERVICES[service], query)
+        self._json(404, {'code': 'not_found', 'path': url.path})
+
+    def do_GET(self):
+        self._route('GET')
+
+    def do_POST(self):
+        self._route('POST')
+
+
+def parse_rows(text: str) -> dict:
+    """'apt=300,villa=80' -> {'apt': 300, 'villa': 80}"""
+    rows = {}
+    for part in text.split(','):
+        if part.strip():
+            ptype, count = part.split('=')
+            rows[ptype.strip()] = int(count)
+    return rows
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='국토교통부/워드프레스 API 로컬 대역 서버')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rows', type=parse_rows, default=parse_rows('apt=120,villa=40,house=10,land=30'),
+                        help='유형별 월 거래 수 (예: apt=300,villa=80)')
+    parser.add_argument('--latency', type=float, default=0.0, help='응답 지연 평균(초), ±50%% 흔들림')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='resultCode 오류 응답 비율')
+    parser.add_argument('--error-code', default='22', help='오류 응답의 resultCode (22: 일일 한도 초과 등)')
+    parser.add_argument('--http-error-rate', type=float, default=0.0, help='MOLIT HTTP 503 응답 비율')
+    parser.add_argument('--cancel-rate', type=float, default=0.0, help='해제 거래(cdealType=O) 비율')
+    parser.add_argument('--wp-fail-rate', type=float, default=0.0, help='워드프레스 생성/수정 502 응답 비율')
+    parser.add_argument('--seed', type=int, default=0, help='오류 주입 난수 시드')
+    parser.add_argument('--verbose', action='store_true', help='요청 로그 출력')
+    return parser
+
+
+def start_background(argv=None) -> ThreadingHTTPServer:
+    """데몬 스레드에서 서버 실행 (벤치마크 등 같은 프로세스에서 쓸 때, --port 0이면 빈 포트)"""
+    args = build_parser().parse_args(argv)
+    Handler.state = StubState(args)
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    Handler.state = StubState(args)
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    base = f"http://{args.host}:{server.server_address[1]}"
+    print(f"🧪 스텁 서버 실행 중: {base}  (MOLIT_BASE_URL={base} WP_URL={base})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"📊 요청 통계: {json.dumps(dict(Handler.state.stats), ensure_ascii=False)}")
+
+
+if __name__ == '__main__':
+    main()